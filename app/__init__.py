@@ -1,9 +1,16 @@
+import logging
+import secrets
 from pathlib import Path
 
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 
+from . import commands, compression, db, health, metrics, search, sessions
+from .config import SECRET_KEY, TRUSTED_PROXIES
 from .routes import bp as main_bp
 
+logger = logging.getLogger(__name__)
+
 
 def create_app():
     base_dir = Path(__file__).resolve().parent.parent
@@ -12,6 +19,22 @@ def create_app():
         template_folder=str(base_dir / "templates"),
         static_folder=str(base_dir / "static"),
     )
-    app.config["SECRET_KEY"] = "dog_playgrounds_secret"
+    if SECRET_KEY:
+        app.config["SECRET_KEY"] = SECRET_KEY
+    else:
+        logger.warning("SECRET_KEY is not set; using a random key for this process")
+        app.config["SECRET_KEY"] = secrets.token_hex(32)
+    if TRUSTED_PROXIES:
+        # request.remote_addr — адрес клиента из X-Forwarded-For
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES
+        )
+    sessions.init_app(app)
+    db.init_app(app)
+    commands.init_app(app)
+    compression.init_app(app)
+    metrics.init_app(app)
+    search.init_app(app)
     app.register_blueprint(main_bp)
+    health.check_schema_in_background()
     return app
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+
+from .config import MAP_INDEX_TTL
+from .db import get_db
+from .indexes import SharedIndex
+from .search import normalize_text
+
+AMENITIES_SQL = """
+    SELECT id, district_norm AS district, lighting, fencing, elements_list
+    FROM playgrounds
+"""
+
+# Флаги из чекбоксов карты
+FLAGS = ("lighting", "fencing", "elements")
+
+# Сколько комбинаций фильтров помнить на один индекс
+MAX_CACHED_MATCHES = 1024
+
+# Номера единичных битов для каждого значения байта
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def element_key(name):
+    """Element type as used in ?element=: lowercase, ё -> е, single spaces."""
+    return normalize_text(name)
+
+
+def _bitset(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+class AmenityIndex:
+    """
+    Playground amenities as bitsets over a fixed id order: bit i of every
+    set stands for the playground ids[i]. Each district, flag and element
+    type has its own set, so a filter combination is an AND of a few ints.
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row["id"])
+        self.ids = [row["id"] for row in rows]
+        self.size = len(self.ids)
+        self.all = (1 << self.size) - 1
+        flags = {name: [] for name in FLAGS}
+        districts = {}
+        element_types = {}
+        self.element_names = {}
+        for position, row in enumerate(rows):
+            if (row["lighting"] or "").strip().lower() == "да":
+                flags["lighting"].append(position)
+            if (row["fencing"] or "").strip().lower() == "да":
+                flags["fencing"].append(position)
+            names = json.loads(row["elements_list"] or "[]")
+            if names:
+                flags["elements"].append(position)
+            if row["district"]:
+                districts.setdefault(row["district"], []).append(position)
+            for name in names:
+                key = element_key(name)
+                if key:
+                    element_types.setdefault(key, []).append(position)
+                    self.element_names.setdefault(key, name)
+        self.flags = {name: _bitset(found, self.size) for name, found in flags.items()}
+        self.districts = {
+            name: _bitset(found, self.size) for name, found in districts.items()
+        }
+        self.element_types = {
+            key: _bitset(found, self.size) for key, found in element_types.items()
+        }
+        self._matches = {}
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    def mask(self, district=None, lighting=False, fencing=False, elements=False,
+             element_types=()):
+        mask = self.all
+        if district:
+            mask &= self.districts.get(district, 0)
+        for name, wanted in zip(FLAGS, (lighting, fencing, elements)):
+            if wanted:
+                mask &= self.flags[name]
+        for key in element_types:
+            mask &= self.element_types.get(key, 0)
+        return mask
+
+    def decode(self, mask):
+        """Playground ids of the set bits, in id order."""
+        ids = []
+        for byte_index, value in enumerate(mask.to_bytes((self.size + 7) // 8, "little")):
+            if value:
+                base = byte_index << 3
+                ids.extend(self.ids[base + bit] for bit in _BYTE_BITS[value])
+        return ids
+
+    def matching(self, district=None, lighting=False, fencing=False, elements=False,
+                 element_types=()):
+        """
+        Ids passing the filters (a frozenset), or None when nothing is
+        filtered. Results are remembered per filter combination.
+        """
+        key = (
+            district or None,
+            bool(lighting),
+            bool(fencing),
+            bool(elements),
+            tuple(sorted(element_types)),
+        )
+        if key == (None, False, False, False, ()):
+            return None
+        with self._lock:
+            ids = self._matches.get(key)
+        if ids is None:
+            ids = frozenset(self.decode(self.mask(*key[:4], element_types=key[4])))
+            with self._lock:
+                if len(self._matches) >= MAX_CACHED_MATCHES:
+                    self._matches.clear()
+                self._matches[key] = ids
+        return ids
+
+    def ordered(self, **filters):
+        """Ids passing the filters in id order."""
+        return self.decode(self.mask(**filters))
+
+    def element_counts(self):
+        return sorted(
+            (
+                {"type": key, "name": self.element_names[key], "count": popcount(mask)}
+                for key, mask in self.element_types.items()
+            ),
+            key=lambda item: (-item["count"], item["type"]),
+        )
+
+
+def filters_from_args(args, district=None):
+    """Amenity filters from query args; ?element= may repeat or be comma-separated."""
+    element_types = []
+    for raw in args.getlist("element"):
+        for name in raw.split(","):
+            key = element_key(name)
+            if key and key not in element_types:
+                element_types.append(key)
+    return {
+        "district": district,
+        "lighting": bool(args.get("lighting")),
+        "fencing": bool(args.get("fencing")),
+        "elements": bool(args.get("elements")),
+        "element_types": tuple(element_types),
+    }
+
+
+def load_rows():
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(AMENITIES_SQL)
+            return cur.fetchall()
+
+
+def build_index():
+    return AmenityIndex(load_rows())
+
+
+_shared = SharedIndex("Amenity index", build_index, MAP_INDEX_TTL)
+
+
+def get_index():
+    """The shared index, rebuilt in the background past MAP_INDEX_TTL."""
+    return _shared.get()
+
+
+def current_index():
+    return _shared.current()
+
+
+def install_index(index):
+    _shared.install(index)
+
+
+def invalidate_index():
+    _shared.invalidate()
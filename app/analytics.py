@@ -0,0 +1,210 @@
+from collections import Counter
+from datetime import date
+
+from .cache import TTLCache
+from .config import ANALYTICS_CACHE_TTL, SLOT_HOURS
+from .migrations import BOOKING_STATS_BACKFILL, ensure_schema
+from .occupancy import CATEGORY_COLUMNS
+
+# booking_stats: подтверждённые брони по (площадка, месяц, день недели, час)
+# и категориям плюс число заполненных слотов. Обновляется в транзакции
+# брони/отмены, так что отчёты не читают bookings.
+
+BOOKINGS_SQL = " + ".join(f"s.{column}" for column in CATEGORY_COLUMNS.values())
+
+# Разрезы для /api/analytics/top: (выражение группировки, поля ответа)
+TOP_DIMENSIONS = {
+    "playground": (
+        "s.playground_id",
+        "s.playground_id AS playground_id, MIN(p.park_name_clean) AS park_name, "
+        "MIN(p.district_norm) AS district",
+    ),
+    "district": ("p.district_norm", "p.district_norm AS district"),
+    "weekday": ("s.weekday", "s.weekday AS weekday"),
+    "hour": ("s.slot_hour", "s.slot_hour AS hour"),
+}
+
+TOP_METRICS = ("bookings", "full_slots")
+
+analytics_cache = TTLCache(ttl=ANALYTICS_CACHE_TTL, max_entries=256)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _stats_key(playground_id, start_time):
+    return (
+        playground_id,
+        month_start(start_time.date()),
+        start_time.isoweekday(),
+        start_time.hour,
+    )
+
+
+def record(cur, playground_id, start_time, category_code, delta, full_delta=0):
+    """
+    Adds one booking (delta=1) or cancellation (delta=-1) to the rollup.
+    `full_delta` is +1/-1 when the change filled or freed a slot. Must run
+    in the booking transaction, like occupancy.adjust.
+    """
+    column = CATEGORY_COLUMNS[category_code]
+    cur.execute(
+        f"""
+        INSERT INTO booking_stats
+            (playground_id, month, weekday, slot_hour, {column}, full_slots)
+        VALUES (%s, %s, %s, %s, GREATEST(%s, 0), GREATEST(%s, 0))
+        ON DUPLICATE KEY UPDATE
+            {column} = GREATEST({column} + %s, 0),
+            full_slots = GREATEST(full_slots + %s, 0)
+        """,
+        (*_stats_key(playground_id, start_time), delta, full_delta, delta, full_delta),
+    )
+
+
+def record_many(cur, playground_id, bookings, category_code):
+    """
+    record() for a batch of new bookings of one category: `bookings` is
+    [(start_time, filled_slot)]. Bookings sharing a rollup row are summed
+    first, so this is one statement however long the batch is.
+    """
+    counts = Counter()
+    filled = Counter()
+    for start_time, filled_slot in bookings:
+        key = _stats_key(playground_id, start_time)
+        counts[key] += 1
+        filled[key] += int(filled_slot)
+    if not counts:
+        return
+    column = CATEGORY_COLUMNS[category_code]
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(counts))
+    params = [
+        value for key, count in counts.items() for value in (*key, count, filled[key])
+    ]
+    cur.execute(
+        f"""
+        INSERT INTO booking_stats
+            (playground_id, month, weekday, slot_hour, {column}, full_slots)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE
+            {column} = {column} + VALUES({column}),
+            full_slots = full_slots + VALUES(full_slots)
+        """,
+        params,
+    )
+
+
+def _filters(start_month, end_month, district=None, playground_id=None):
+    joins = ""
+    conditions = ["s.month BETWEEN %s AND %s"]
+    params = [start_month, end_month]
+    if district:
+        joins = "JOIN playgrounds p ON p.id = s.playground_id"
+        conditions.append("p.district_norm = %s")
+        params.append(district)
+    if playground_id:
+        conditions.append("s.playground_id = %s")
+        params.append(playground_id)
+    return joins, " AND ".join(conditions), params
+
+
+def heatmap(cur, start_month, end_month, district=None, playground_id=None,
+            category=None):
+    """
+    Weekday x hour matrices of bookings and filled slots over whole months
+    [start_month, end_month]. Rows are ISO weekdays 1..7, columns SLOT_HOURS.
+    """
+    bookings_sql = f"s.{CATEGORY_COLUMNS[category]}" if category else BOOKINGS_SQL
+    joins, where, params = _filters(start_month, end_month, district, playground_id)
+    cur.execute(
+        f"""
+        SELECT s.weekday, s.slot_hour,
+               SUM({bookings_sql}) AS bookings,
+               SUM(s.full_slots) AS full_slots
+        FROM booking_stats s
+        {joins}
+        WHERE {where}
+        GROUP BY s.weekday, s.slot_hour
+        """,
+        params,
+    )
+    hour_index = {hour: position for position, hour in enumerate(SLOT_HOURS)}
+    bookings = [[0] * len(SLOT_HOURS) for _ in range(7)]
+    full_slots = [[0] * len(SLOT_HOURS) for _ in range(7)]
+    for row in cur.fetchall():
+        position = hour_index.get(int(row["slot_hour"]))
+        if position is None:
+            continue
+        bookings[row["weekday"] - 1][position] = int(row["bookings"] or 0)
+        full_slots[row["weekday"] - 1][position] = int(row["full_slots"] or 0)
+    return {
+        "from": start_month.isoformat(),
+        "to": end_month.isoformat(),
+        "weekdays": list(range(1, 8)),
+        "hours": list(SLOT_HOURS),
+        "bookings": bookings,
+        "full_slots": full_slots,
+    }
+
+
+def top(cur, by, metric, limit, start_month, end_month, district=None):
+    """Top `limit` values of a dimension (TOP_DIMENSIONS or "category")."""
+    if by == "category":
+        return _top_categories(cur, metric, start_month, end_month, district)
+    group_sql, select_sql = TOP_DIMENSIONS[by]
+    joins, where, params = _filters(start_month, end_month, district)
+    if by in ("playground", "district") and not joins:
+        joins = "JOIN playgrounds p ON p.id = s.playground_id"
+    metric_sql = BOOKINGS_SQL if metric == "bookings" else "s.full_slots"
+    cur.execute(
+        f"""
+        SELECT {select_sql}, SUM({metric_sql}) AS value
+        FROM booking_stats s
+        {joins}
+        WHERE {where}
+        GROUP BY {group_sql}
+        ORDER BY value DESC
+        LIMIT %s
+        """,
+        (*params, limit),
+    )
+    return [{**row, "value": int(row["value"] or 0)} for row in cur.fetchall()]
+
+
+def _top_categories(cur, metric, start_month, end_month, district):
+    # Заполненные слоты по категориям не раскладываются
+    if metric != "bookings":
+        raise ValueError("Only bookings can be grouped by category")
+    joins, where, params = _filters(start_month, end_month, district)
+    sums = ", ".join(
+        f"SUM(s.{column}) AS {column}" for column in CATEGORY_COLUMNS.values()
+    )
+    cur.execute(f"SELECT {sums} FROM booking_stats s {joins} WHERE {where}", params)
+    row = cur.fetchone() or {}
+    results = [
+        {"category": code, "value": int(row.get(column) or 0)}
+        for code, column in CATEGORY_COLUMNS.items()
+    ]
+    results.sort(key=lambda item: -item["value"])
+    return results
+
+
+def default_range(months, today=None):
+    """(first month, current month) covering the last `months` months."""
+    end = month_start(today or date.today())
+    year, month = divmod(end.year * 12 + end.month - 1 - (months - 1), 12)
+    return date(year, month + 1, 1), end
+
+
+def rebuild(conn):
+    """Recomputes booking_stats from bookings and slot_occupancy."""
+    ensure_schema(conn)
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM booking_stats")
+        for statement in BOOKING_STATS_BACKFILL:
+            cur.execute(statement)
+        cur.execute("SELECT COUNT(*) FROM booking_stats")
+        written = cur.fetchone()[0]
+    conn.commit()
+    analytics_cache.clear()
+    return written
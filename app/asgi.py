@@ -0,0 +1,348 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import date
+
+import aiomysql
+from asgiref.wsgi import WsgiToAsgi
+from pymysql.err import MySQLError
+from quart import Quart, Response, jsonify, request
+from quart.wrappers.response import DataBody
+from werkzeug.exceptions import HTTPException
+
+from . import amenities, compression, create_app, occupancy, search, spatial
+from .cache import CachedResponse, cache_key, catalogue_cache
+from .categories import cached_dog_category, remember_dog_category
+from .config import (
+    CACHE_MAX_AGE,
+    CATEGORY_LABELS,
+    DB_CONFIG,
+    DB_POOL_CONFIG,
+    MAP_INDEX_TTL,
+    SEARCH_INDEX_TTL,
+    SEARCH_MAX_RESULTS,
+)
+from .formats import encode_points, negotiate_points_format
+from .normalize import normalize_district
+from .queries import (
+    DISTRICTS_SQL,
+    DOG_CATEGORY_SQL,
+    PLAYGROUND_DETAILS_SQL,
+)
+from .services import slot_statuses
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPool:
+    """aiomysql pool configured from the same DB_* / DB_POOL_* settings."""
+
+    def __init__(self, db_config, pool_config):
+        self.db_config = db_config
+        self.pool_config = pool_config
+        self.pool = None
+
+    async def open(self):
+        self.pool = await aiomysql.create_pool(
+            host=self.db_config["host"],
+            port=self.db_config["port"],
+            user=self.db_config["user"],
+            password=self.db_config["password"],
+            db=self.db_config["database"],
+            minsize=0,
+            maxsize=self.pool_config["size"] + self.pool_config["max_overflow"],
+            pool_recycle=self.pool_config["recycle"],
+            autocommit=True,
+            charset="utf8mb4",
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def fetchall(self, query, params=()):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(query, params)
+                return await cur.fetchall()
+
+    async def fetchone(self, query, params=()):
+        rows = await self.fetchall(query, params)
+        return rows[0] if rows else None
+
+    def stats(self):
+        if self.pool is None:
+            return {"open": False}
+        return {
+            "open": True,
+            "size": self.pool.size,
+            "free": self.pool.freesize,
+            "maxsize": self.pool.maxsize,
+        }
+
+
+db = AsyncPool(DB_CONFIG, DB_POOL_CONFIG)
+
+
+def database_error(exc):
+    return jsonify({"error": "Database error", "details": str(exc)}), 500
+
+
+def async_cached_response(vary=()):
+    """Async counterpart of cache.cached_response sharing catalogue_cache."""
+
+    def decorator(view):
+        async def wrapper(*args, **kwargs):
+            key = cache_key(request, vary)
+            entry = catalogue_cache.get(key)
+            if entry is None:
+                response = await view(*args, **kwargs)
+                if isinstance(response, tuple) or response.status_code != 200:
+                    return response
+                entry = CachedResponse(await response.get_data(), response.mimetype)
+                catalogue_cache.set(key, entry)
+            matched = entry.matching_etag(request.if_none_match)
+            if matched:
+                response = Response("", status=304)
+                response.set_etag(matched)
+            else:
+                response = Response(entry.body, mimetype=entry.mimetype)
+                response.set_etag(entry.etag)
+            response.cache_control.public = True
+            response.cache_control.max_age = CACHE_MAX_AGE
+            for header in vary:
+                response.vary.add(header)
+            return response
+
+        wrapper.__name__ = view.__name__
+        return wrapper
+
+    return decorator
+
+
+def points_response(rows):
+    body, mimetype = encode_points(
+        rows, negotiate_points_format(request.args, request.accept_mimetypes)
+    )
+    if body is None:
+        return jsonify(rows)
+    return Response(body, mimetype=mimetype)
+
+
+class AsyncIndex:
+    """
+    Loads one of the shared in-memory indexes for the async app. Rows come
+    over aiomysql, the CPU-bound build runs in a thread so the event loop
+    keeps serving, and concurrent requests wait for a single build. Past
+    `ttl` the old index is served while a new one is built in the background.
+    """
+
+    def __init__(self, module, sql, build, ttl):
+        self.module = module
+        self.sql = sql
+        self.build = build
+        self.ttl = ttl
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+
+    def _fresh(self, index):
+        return time.monotonic() - index.built_at <= self.ttl
+
+    async def _rebuild(self):
+        async with self._lock:
+            index = self.module.current_index()
+            if index is not None and self._fresh(index):
+                return index
+            rows = await db.fetchall(self.sql)
+            loop = asyncio.get_running_loop()
+            index = await loop.run_in_executor(None, self.build, rows)
+            self.module.install_index(index)
+            return index
+
+    async def _refresh(self):
+        try:
+            await self._rebuild()
+        except MySQLError:
+            logger.exception("Index refresh failed")
+
+    async def get(self):
+        index = self.module.current_index()
+        if index is None:
+            return await self._rebuild()
+        if not self._fresh(index) and not self._lock.locked():
+            task = asyncio.create_task(self._refresh())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return index
+
+
+def _build_spatial_index(rows):
+    return spatial.build_index([spatial.point_from_row(row) for row in rows])
+
+
+spatial_loader = AsyncIndex(spatial, spatial.POINTS_SQL, _build_spatial_index, MAP_INDEX_TTL)
+amenity_loader = AsyncIndex(
+    amenities, amenities.AMENITIES_SQL, amenities.AmenityIndex, MAP_INDEX_TTL
+)
+search_loader = AsyncIndex(search, search.DOCUMENTS_SQL, search.build_index, SEARCH_INDEX_TTL)
+
+
+async def compress_async_response(response):
+    """Async counterpart of compression.compress_response."""
+    if not isinstance(response.response, DataBody) or not compression.wants_compression(
+        response
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = compression.choose_encoding(request.accept_encodings)
+    if encoding is not None:
+        compression.encode_response(response, await response.get_data(), encoding)
+    return response
+
+
+async def resolve_requested_category():
+    requested_category = request.args.get("category", "STANDARD").upper()
+    try:
+        dog_id = int(request.args.get("dog_id") or 0)
+    except ValueError:
+        dog_id = 0
+    if dog_id:
+        code = cached_dog_category(dog_id)
+        if code is None:
+            dog_row = await db.fetchone(DOG_CATEGORY_SQL, (dog_id,))
+            code = dog_row["category_code"] if dog_row else None
+            remember_dog_category(dog_id, code)
+        requested_category = code or requested_category
+    if requested_category not in CATEGORY_LABELS:
+        requested_category = "STANDARD"
+    return requested_category
+
+
+def create_async_app():
+    app = Quart(__name__, static_folder=None)
+
+    @app.before_serving
+    async def open_pool():
+        await db.open()
+
+    @app.after_serving
+    async def close_pool():
+        await db.close()
+
+    app.after_request(compress_async_response)
+
+    @app.route("/api/playgrounds")
+    @async_cached_response(vary=("Accept",))
+    async def get_playgrounds():
+        district = normalize_district(request.args.get("district"))
+        filters = amenities.filters_from_args(request.args, district)
+        bbox = request.args.get("bbox")
+        near = request.args.get("near")
+        try:
+            index = await spatial_loader.get()
+            amenity_index = await amenity_loader.get()
+            if bbox or near:
+                try:
+                    query = spatial.parse_index_query(
+                        bbox, near, request.args.get("radius"), request.args.get("limit")
+                    )
+                except ValueError:
+                    return jsonify({"error": "Invalid bbox, near or radius"}), 400
+                allowed = amenity_index.matching(**filters)
+                return points_response(spatial.query_points(index, allowed, **query))
+            return points_response(
+                spatial.points_for_ids(index, amenity_index.ordered(**filters))
+            )
+        except MySQLError as exc:
+            return database_error(exc)
+
+    @app.route("/api/playgrounds/search")
+    @async_cached_response()
+    async def search_playgrounds():
+        district = normalize_district(request.args.get("district"))
+        text_query = (request.args.get("q") or "").strip()
+        if not district and not text_query:
+            return jsonify({"error": "District or query is required"}), 400
+        filters = amenities.filters_from_args(request.args, district)
+        try:
+            amenity_index = await amenity_loader.get()
+            index = await search_loader.get()
+            if text_query:
+                try:
+                    limit = min(int(request.args.get("limit") or SEARCH_MAX_RESULTS),
+                                SEARCH_MAX_RESULTS)
+                except ValueError:
+                    return jsonify({"error": "Invalid limit"}), 400
+                return jsonify(index.search(
+                    text_query,
+                    limit=limit,
+                    allowed=amenity_index.matching(**filters),
+                ))
+            rows = index.rows(amenity_index.ordered(**filters))
+        except MySQLError as exc:
+            return database_error(exc)
+        return jsonify(rows)
+
+    @app.route("/api/districts")
+    @async_cached_response()
+    async def get_districts():
+        try:
+            rows = await db.fetchall(DISTRICTS_SQL)
+        except MySQLError as exc:
+            return database_error(exc)
+        return jsonify([row["district"] for row in rows])
+
+    @app.route("/api/playgrounds/<int:playground_id>/details")
+    async def get_playground_details(playground_id):
+        try:
+            requested_category = await resolve_requested_category()
+            row = await db.fetchone(PLAYGROUND_DETAILS_SQL, (playground_id,))
+            if not row:
+                return jsonify({"error": "Playground not found"}), 404
+            occupancy_rows = await db.fetchall(
+                occupancy.DAY_SQL, (playground_id, date.today())
+            )
+        except MySQLError as exc:
+            return database_error(exc)
+
+        bookings_by_hour = occupancy.day_from_rows(occupancy_rows)
+        row["elements_list"] = json.loads(row["elements_list"] or "[]")
+        row["requested_category"] = requested_category
+        row["slots"] = slot_statuses(bookings_by_hour, requested_category)
+        return jsonify(row)
+
+    return app
+
+
+class ServingModeDispatcher:
+    """
+    Sends requests for the async read endpoints to the Quart app and
+    everything else (pages, static files, writes, auth) to the Flask app.
+    """
+
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+        self.adapter = async_app.url_map.bind("localhost")
+
+    def handles(self, scope):
+        try:
+            self.adapter.match(scope["path"], method=scope.get("method", "GET"))
+        except HTTPException:
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan" or (
+            scope["type"] == "http" and self.handles(scope)
+        ):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+
+def create_asgi_app():
+    return ServingModeDispatcher(create_async_app(), create_app())
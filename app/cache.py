@@ -0,0 +1,130 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from .config import CACHE_MAX_AGE, CACHE_MAX_ENTRIES, CACHE_TTL
+
+
+class TTLCache:
+    """
+    Thread-safe key/value cache with per-entry expiry and LRU eviction.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
+
+
+class CachedResponse:
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+    def matching_etag(self, if_none_match):
+        """
+        The tag from If-None-Match that names this entry, including the
+        variants with a content-encoding suffix added by compression.
+        """
+        for tag in (self.etag, f"{self.etag}-gzip", f"{self.etag}-br"):
+            if if_none_match.contains(tag):
+                return tag
+        return None
+
+    def to_response(self, max_age):
+        matched = self.matching_etag(request.if_none_match)
+        if matched:
+            response = Response(status=304)
+            response.set_etag(matched)
+        else:
+            response = Response(self.body, mimetype=self.mimetype)
+            response.set_etag(self.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response
+
+
+# Ответы каталога площадок: меняются только при импорте данных
+catalogue_cache = TTLCache()
+
+
+def cache_key(req, vary=()):
+    return (
+        req.path,
+        tuple(sorted(req.args.items(multi=True))),
+        tuple(req.headers.get(header, "") for header in vary),
+    )
+
+
+def cached_response(cache, ttl=None, max_age=CACHE_MAX_AGE, vary=()):
+    """
+    Caches successful responses of a view by path, query string and the
+    `vary` request headers, adds a strong ETag and Cache-Control, and
+    answers If-None-Match with 304.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = cache_key(request, vary)
+            entry = cache.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = CachedResponse(response.get_data(), response.mimetype)
+                cache.set(key, entry, ttl)
+            response = entry.to_response(max_age)
+            for header in vary:
+                response.vary.add(header)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,81 @@
+import threading
+
+from .cache import TTLCache
+from .config import DOG_CATEGORY_CACHE_SIZE, DOG_CATEGORY_CACHE_TTL
+from .db import get_db
+from .queries import DOG_CATEGORY_SQL
+
+BREED_CATEGORIES_SQL = "SELECT id, code FROM breed_categories"
+
+
+class BreedCategories:
+    """code <-> id of breed_categories; four rows that never change at runtime."""
+
+    def __init__(self, rows):
+        self.ids = {row["code"]: row["id"] for row in rows}
+        self.codes = {row["id"]: row["code"] for row in rows}
+
+
+_breeds = None
+_breeds_lock = threading.Lock()
+
+
+def get_breed_categories():
+    global _breeds
+    if _breeds is None:
+        with _breeds_lock:
+            if _breeds is None:
+                with get_db() as conn:
+                    with conn.cursor(dictionary=True) as cur:
+                        cur.execute(BREED_CATEGORIES_SQL)
+                        _breeds = BreedCategories(cur.fetchall())
+    return _breeds
+
+
+def category_id(code):
+    """breed_categories.id for a code such as 'SMALL', or None."""
+    return get_breed_categories().ids.get(code)
+
+
+def category_code(category_id_value):
+    return get_breed_categories().codes.get(category_id_value)
+
+
+# dog_id -> код категории. Категория собаки не меняется после создания,
+# но записи всё равно сбрасываются при любой записи в dogs.
+dog_categories = TTLCache(ttl=DOG_CATEGORY_CACHE_TTL, max_entries=DOG_CATEGORY_CACHE_SIZE)
+
+
+def cached_dog_category(dog_id):
+    return dog_categories.get(dog_id)
+
+
+def remember_dog_category(dog_id, code):
+    if code:
+        dog_categories.set(dog_id, code)
+
+
+def dog_category(dog_id, cur=None):
+    """
+    Category code of a dog, or None when the dog does not exist. Misses are
+    read with `cur` when given (e.g. inside a booking transaction).
+    """
+    code = dog_categories.get(dog_id)
+    if code is not None:
+        return code
+    if cur is not None:
+        cur.execute(DOG_CATEGORY_SQL, (dog_id,))
+        row = cur.fetchone()
+    else:
+        with get_db() as conn:
+            with conn.cursor(dictionary=True) as own_cur:
+                own_cur.execute(DOG_CATEGORY_SQL, (dog_id,))
+                row = own_cur.fetchone()
+    code = row["category_code"] if row else None
+    remember_dog_category(dog_id, code)
+    return code
+
+
+def forget_dog(dog_id):
+    """Call after inserting, updating or deleting a dog row."""
+    dog_categories.delete(dog_id)
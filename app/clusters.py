@@ -0,0 +1,173 @@
+import math
+import threading
+from collections import OrderedDict
+
+from . import amenities
+from .spatial import get_index
+
+TILE_SIZE = 256
+# Радиус кластера в пикселях экрана
+CLUSTER_RADIUS_PX = 60
+MIN_ZOOM = 0
+# Начиная с MAX_ZOOM + 1 площадки отдаются без кластеризации
+MAX_ZOOM = 16
+# Сколько деревьев (комбинаций фильтров) держать; вытесняются давно не нужные
+MAX_CACHED_TREES = 64
+
+
+def lon_to_x(lon):
+    return lon / 360.0 + 0.5
+
+
+def lat_to_y(lat):
+    sin_lat = math.sin(math.radians(lat))
+    sin_lat = min(max(sin_lat, -0.9999), 0.9999)
+    y = 0.5 - 0.25 * math.log((1 + sin_lat) / (1 - sin_lat)) / math.pi
+    return min(max(y, 0.0), 1.0)
+
+
+def x_to_lon(x):
+    return (x - 0.5) * 360.0
+
+
+def y_to_lat(y):
+    y2 = (180 - y * 360) * math.pi / 180
+    return 360 * math.atan(math.exp(y2)) / math.pi - 90
+
+
+def cell_size(zoom):
+    """Cluster cell size in normalized Web Mercator units for the zoom level."""
+    return CLUSTER_RADIUS_PX / (TILE_SIZE * 2 ** zoom)
+
+
+class ClusterLevel:
+    def __init__(self, zoom, clusters):
+        self.zoom = zoom
+        self.size = cell_size(min(zoom, MAX_ZOOM))
+        self.clusters = clusters
+        self.cells = {}
+        for cluster in clusters:
+            key = (int(cluster["x"] // self.size), int(cluster["y"] // self.size))
+            self.cells.setdefault(key, []).append(cluster)
+
+    def query(self, min_x, min_y, max_x, max_y):
+        min_col, min_row = int(min_x // self.size), int(min_y // self.size)
+        max_col, max_row = int(max_x // self.size), int(max_y // self.size)
+        if (max_col - min_col + 1) * (max_row - min_row + 1) > len(self.cells):
+            candidates = self.clusters
+        else:
+            candidates = []
+            for col in range(min_col, max_col + 1):
+                for row in range(min_row, max_row + 1):
+                    candidates.extend(self.cells.get((col, row), ()))
+        return [
+            cluster
+            for cluster in candidates
+            if min_x <= cluster["x"] <= max_x and min_y <= cluster["y"] <= max_y
+        ]
+
+
+class ClusterTree:
+    """
+    Hierarchical grid clustering of playground points (supercluster-style).
+
+    Level MAX_ZOOM + 1 holds the points themselves; every lower level merges
+    the clusters of the level above that fall into the same grid cell, using
+    a count-weighted centroid.
+    """
+
+    def __init__(self, points):
+        current = [
+            {"x": lon_to_x(p["lon"]), "y": lat_to_y(p["lat"]), "count": 1, "id": p["id"]}
+            for p in points
+        ]
+        self.levels = {MAX_ZOOM + 1: ClusterLevel(MAX_ZOOM + 1, current)}
+        for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+            current = self._merge(current, cell_size(zoom))
+            self.levels[zoom] = ClusterLevel(zoom, current)
+
+    @staticmethod
+    def _merge(clusters, size):
+        groups = {}
+        for cluster in clusters:
+            key = (int(cluster["x"] // size), int(cluster["y"] // size))
+            groups.setdefault(key, []).append(cluster)
+        merged = []
+        for members in groups.values():
+            if len(members) == 1:
+                merged.append(members[0])
+                continue
+            count = sum(m["count"] for m in members)
+            merged.append(
+                {
+                    "x": sum(m["x"] * m["count"] for m in members) / count,
+                    "y": sum(m["y"] * m["count"] for m in members) / count,
+                    "count": count,
+                }
+            )
+        return merged
+
+    def query(self, zoom, bbox=None):
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM + 1)
+        level = self.levels[zoom]
+        if bbox is None:
+            found = level.clusters
+        else:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            found = level.query(
+                lon_to_x(min_lon), lat_to_y(max_lat), lon_to_x(max_lon), lat_to_y(min_lat)
+            )
+        result = []
+        for cluster in found:
+            item = {
+                "lat": y_to_lat(cluster["y"]),
+                "lon": x_to_lon(cluster["x"]),
+                "count": cluster["count"],
+            }
+            if "id" in cluster:
+                item["id"] = cluster["id"]
+            result.append(item)
+        return result
+
+
+_trees = OrderedDict()
+_trees_index = None
+_trees_lock = threading.Lock()
+
+
+def get_cluster_tree(filters):
+    """
+    Returns the cluster tree for a combination of amenity filters (see
+    amenities.filters_from_args), built once per pair of spatial and amenity
+    indexes and kept for the MAX_CACHED_TREES most recently used combinations.
+    """
+    global _trees_index
+    index = get_index()
+    amenity_index = amenities.get_index()
+    allowed = amenity_index.matching(**filters)
+    key = (
+        filters.get("district") or None,
+        bool(filters.get("lighting")),
+        bool(filters.get("fencing")),
+        bool(filters.get("elements")),
+        tuple(sorted(filters.get("element_types", ()))),
+    )
+    with _trees_lock:
+        if _trees_index != (index, amenity_index):
+            _trees.clear()
+            _trees_index = (index, amenity_index)
+        tree = _trees.get(key)
+        if tree is not None:
+            _trees.move_to_end(key)
+    if tree is None:
+        if allowed is None:
+            points = list(index.points.values())
+        else:
+            points = [index.points[pid] for pid in sorted(allowed) if pid in index.points]
+        tree = ClusterTree(points)
+        with _trees_lock:
+            if _trees_index == (index, amenity_index):
+                _trees[key] = tree
+                while len(_trees) > MAX_CACHED_TREES:
+                    _trees.popitem(last=False)
+    return tree
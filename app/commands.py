@@ -0,0 +1,92 @@
+import click
+
+from . import analytics, migrations, occupancy
+from .db import get_db
+from .explain import check_query_plans
+from .importer import import_records, iter_file_records
+from .normalize import normalize_playgrounds
+from .services import invalidate_catalogue
+
+
+@click.command("rebuild-occupancy")
+def rebuild_occupancy_command():
+    """Rebuild the slot_occupancy table from confirmed bookings."""
+    with get_db() as conn:
+        written = occupancy.rebuild(conn)
+    click.echo(f"slot_occupancy rebuilt: {written} slots")
+
+
+@click.command("rebuild-analytics")
+def rebuild_analytics_command():
+    """Rebuild the booking_stats rollup from bookings and slot_occupancy."""
+    with get_db() as conn:
+        written = analytics.rebuild(conn)
+    click.echo(f"booking_stats rebuilt: {written} rows")
+
+
+@click.command("normalize-playgrounds")
+@click.option("--batch-size", default=1000, show_default=True)
+def normalize_playgrounds_command(batch_size):
+    """Precompute cleaned names, photo URLs, districts and element lists."""
+    with get_db() as conn:
+        updated = normalize_playgrounds(
+            conn,
+            batch_size=batch_size,
+            progress=lambda done: click.echo(f"normalized {done} playgrounds"),
+        )
+    invalidate_catalogue()
+    click.echo(f"Done: {updated} playgrounds normalized")
+
+
+@click.command("import-playgrounds")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=1000, show_default=True)
+def import_playgrounds_command(path, batch_size):
+    """Upsert playgrounds from a data.mos.ru JSON or CSV export."""
+    with get_db() as conn:
+        stats = import_records(
+            conn,
+            iter_file_records(path),
+            batch_size=batch_size,
+            progress=lambda current: click.echo(str(current)),
+        )
+    invalidate_catalogue()
+    click.echo(f"Import finished in {stats.elapsed:.1f}s: {stats}")
+
+
+@click.command("migrate")
+@click.option("--target", type=int, help="stop after this version")
+def migrate_command(target):
+    """Apply pending schema migrations."""
+    with get_db() as conn:
+        applied = migrations.migrate(
+            conn,
+            target=target,
+            progress=lambda version, name, seconds: click.echo(
+                f"applied {version:04d} {name} ({seconds:.1f}s)"
+            ),
+        )
+    click.echo(
+        f"Schema is at version {max(applied)}" if applied else "Schema is up to date"
+    )
+
+
+@click.command("check-query-plans")
+def check_query_plans_command():
+    """EXPLAIN the hot queries and fail if any of them scans a whole table."""
+    with get_db() as conn:
+        problems = check_query_plans(conn)
+    for name, table, rows in problems:
+        click.echo(f"FULL SCAN: {name}: {table} (~{rows} rows)", err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo("All hot queries use indexes")
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_occupancy_command)
+    app.cli.add_command(rebuild_analytics_command)
+    app.cli.add_command(normalize_playgrounds_command)
+    app.cli.add_command(import_playgrounds_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(check_query_plans_command)
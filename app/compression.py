@@ -0,0 +1,76 @@
+import gzip
+
+from flask import request
+
+from .config import COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдаём gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-playgrounds",
+    "text/html",
+    "text/css",
+    "application/javascript",
+    "text/javascript",
+}
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=min(COMPRESSION_LEVEL, 11))
+    return gzip.compress(body, compresslevel=COMPRESSION_LEVEL)
+
+
+def wants_compression(response):
+    """Status, encoding and type checks shared with the async app."""
+    return not (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def encode_response(response, body, encoding):
+    """Replaces `body` with its encoded form unless it is too small to bother."""
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip/brotli-encodes buffered responses of
+    compressible types. Streams (SSE) and small bodies are left alone.
+    """
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or not wants_compression(response)
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is not None:
+        encode_response(response, response.get_data(), encoding)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
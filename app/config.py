@@ -13,8 +13,112 @@ DB_CONFIG = {
     "use_pure": os.getenv("DB_USE_PURE", "True").lower() == "true",
 }
 
+# Параметры пула соединений с БД
+DB_POOL_CONFIG = {
+    "size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "recycle": int(os.getenv("DB_POOL_RECYCLE", "3600")),
+    "pre_ping": os.getenv("DB_POOL_PRE_PING", "True").lower() == "true",
+}
+
+# Ключ приложения: задаётся в окружении, иначе случайный на каждый запуск
+SECRET_KEY = os.getenv("SECRET_KEY")
+
+# Сессии: cookie (подписанная cookie Flask, по умолчанию), redis (серверные,
+# общие для всех воркеров) или memory (серверные в процессе — только для
+# одного процесса). Контекст пользователя (профиль, собаки, брони)
+# кэшируется в хранилище сессий; при cookie он не кэшируется.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cookie").lower()
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/1")
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(14 * 24 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "100000"))
+USER_CONTEXT_TTL = int(os.getenv("USER_CONTEXT_TTL", "300"))
+
+# Кэш ответов каталога площадок (секунды)
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+# Сжатие ответов (gzip, brotli при наличии пакета)
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Метрики /metrics и журнал медленных запросов (по умолчанию выключены)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_QUERY_LOG_LIMIT = int(os.getenv("SLOW_QUERY_LOG_LIMIT", "50"))
+
+# Проверки /healthz, /readyz и /api/diagnostics (секунды)
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", "1"))
+DIAGNOSTICS_REFRESH_SECONDS = int(os.getenv("DIAGNOSTICS_REFRESH_SECONDS", "60"))
+
+# Полнотекстовый поиск: пересборка индекса (с) и размер выдачи
+SEARCH_INDEX_TTL = int(os.getenv("SEARCH_INDEX_TTL", "600"))
+SEARCH_MAX_RESULTS = 50
+
+# Пересборка индексов карты (сетка координат и удобства), с; по умолчанию
+# вместе с поисковым, чтобы списки и карта не расходились
+MAP_INDEX_TTL = int(os.getenv("MAP_INDEX_TTL", str(SEARCH_INDEX_TTL)))
+
+# Канал обновлений слотов: memory (в процессе) или redis. Каждый открытый
+# поток SSE занимает поток сервера, поэтому нужен многопоточный сервер или
+# gevent/eventlet-воркеры (EVENTS_GREEN_WORKERS=1), а при нескольких
+# процессах — redis: memory не передаёт события между ними.
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory").lower()
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/0")
+EVENTS_HEARTBEAT = int(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_GREEN_WORKERS = os.getenv("EVENTS_GREEN_WORKERS", "0") == "1"
+# Не больше стольких потоков SSE на процесс, чтобы они не заняли все потоки
+EVENTS_MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS", "32"))
+
 SLOT_HOURS = list(range(0, 24))
 
+# Окно для /api/playgrounds/<id>/availability (дни)
+AVAILABILITY_DEFAULT_DAYS = 14
+AVAILABILITY_MAX_DAYS = 62
+
+# Поиск свободных слотов рядом: радиус (м) и число проверяемых площадок
+FREE_SLOTS_MAX_RADIUS = 20000
+FREE_SLOTS_MAX_CANDIDATES = 500
+
+# Постраничная выдача списков (/api/my-bookings, /api/dogs)
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+
+# Кэш категорий собак (dog_id -> код категории)
+DOG_CATEGORY_CACHE_SIZE = int(os.getenv("DOG_CATEGORY_CACHE_SIZE", "10000"))
+DOG_CATEGORY_CACHE_TTL = int(os.getenv("DOG_CATEGORY_CACHE_TTL", "3600"))
+
+# Хэширование паролей в отдельных процессах. Метод в формате werkzeug;
+# по умолчанию тот же scrypt, что у generate_password_hash, которым хэшированы
+# существующие пароли. Хэши другим методом пересчитываются при следующем входе
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "5"))
+
+# Ограничение попыток входа и регистрации за окно (секунды)
+LOGIN_RATE_WINDOW = int(os.getenv("LOGIN_RATE_WINDOW", "60"))
+LOGIN_RATE_USERNAME = int(os.getenv("LOGIN_RATE_USERNAME", "5"))
+LOGIN_RATE_IP = int(os.getenv("LOGIN_RATE_IP", "30"))
+
+# Сколько обратных прокси перед приложением добавляют X-Forwarded-For.
+# Без этого лимит по IP считает адрес прокси, то есть общий для всех.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+
+# Аналитика броней: кэш ответов (с), окно по умолчанию (мес.), размер топа
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+ANALYTICS_DEFAULT_MONTHS = 12
+ANALYTICS_TOP_MAX = 100
+
+# Сколько раз повторять транзакцию бронирования при дедлоке
+BOOKING_MAX_RETRIES = int(os.getenv("BOOKING_MAX_RETRIES", "3"))
+
+# Максимум слотов в одном пакетном бронировании (/api/book/batch)
+BOOKING_BATCH_MAX_SLOTS = 100
+
 CATEGORY_LABELS = {
     "SMALL": "Декоративные",
     "STANDARD": "Стандартные",
@@ -1,7 +1,232 @@
+import threading
+import time
+from collections import deque
+
 import mysql.connector
+from mysql.connector.errors import PoolError
+from flask import g, has_app_context
+
+from .config import DB_CONFIG, DB_POOL_CONFIG
+from .metrics import record_checkout, wrap_cursor
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+
+    Keeps up to `size` idle connections, allows `max_overflow` extra ones under
+    load, waits up to `timeout` seconds for a free connection, pings on
+    checkout when `pre_ping` is set and reconnects connections older than
+    `recycle` seconds.
+    """
+
+    def __init__(self, db_config, size=5, max_overflow=10, timeout=30.0,
+                 recycle=3600, pre_ping=True):
+        self.db_config = dict(db_config)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._checked_out = 0
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "checkout_waits": 0,
+            "checkout_timeouts": 0,
+            "failed_pings": 0,
+            "recycled": 0,
+        }
+
+    @property
+    def capacity(self):
+        return self.size + self.max_overflow
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.db_config)
+        # Время создания храним на самом соединении: id() после закрытия
+        # может достаться новому объекту
+        raw._pool_created_at = time.monotonic()
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return raw
+
+    def _discard(self, raw):
+        with self._cond:
+            self._stats["connections_closed"] += 1
+        try:
+            raw.close()
+        except mysql.connector.Error:
+            pass
+
+    def _is_usable(self, raw):
+        created_at = getattr(raw, "_pool_created_at", None)
+        if created_at is not None and self.recycle is not None and self.recycle >= 0:
+            if time.monotonic() - created_at > self.recycle:
+                with self._cond:
+                    self._stats["recycled"] += 1
+                return False
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except mysql.connector.Error:
+                with self._cond:
+                    self._stats["failed_pings"] += 1
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        """Checks out a connection, waiting up to `timeout` (default: pool timeout)."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            waited = False
+            while not self._idle and self._checked_out >= self.capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["checkout_timeouts"] += 1
+                    raise PoolError(
+                        f"Connection pool exhausted: {self.capacity} connections "
+                        f"in use, waited {timeout}s"
+                    )
+                if not waited:
+                    self._stats["checkout_waits"] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            raw = self._idle.popleft() if self._idle else None
+            self._checked_out += 1
+            self._stats["checkouts"] += 1
+
+        try:
+            if raw is not None and not self._is_usable(raw):
+                self._discard(raw)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+        except BaseException:
+            with self._cond:
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+        return raw
+
+    def release(self, raw):
+        try:
+            # Сбрасываем незавершённую транзакцию, чтобы следующий запрос
+            # не увидел чужой снимок данных.
+            raw.rollback()
+        except mysql.connector.Error:
+            self._discard(raw)
+            raw = None
+
+        with self._cond:
+            self._checked_out -= 1
+            keep = raw is not None and len(self._idle) < self.size
+            if keep:
+                self._idle.append(raw)
+            self._cond.notify()
+        if raw is not None and not keep:
+            self._discard(raw)
+
+    def dispose(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for raw in idle:
+            self._discard(raw)
 
-from .config import DB_CONFIG
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "timeout": self.timeout,
+                "recycle": self.recycle,
+                "pre_ping": self.pre_ping,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "overflow": max(0, self._checked_out + len(self._idle) - self.size),
+                **self._stats,
+            }
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled connection.
+
+    Supports the same `with get_db() as conn:` usage as a plain connection,
+    but returns the connection to the pool instead of closing it. Scoped
+    connections belong to the current app context and are released on
+    teardown, so all `with` blocks of one request share them.
+    """
+
+    def __init__(self, pool, raw, scoped=False):
+        self._pool = pool
+        self._raw = raw
+        self._scoped = scoped
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return wrap_cursor(self.__getattr__("cursor")(*args, **kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except mysql.connector.Error:
+                pass
+        if not self._scoped:
+            self.close()
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+    return _pool
 
 
 def get_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    pool = get_pool()
+    if not has_app_context():
+        record_checkout()
+        return PooledConnection(pool, pool.acquire())
+    conn = g.get("_db_conn")
+    if conn is None or conn._raw is None:
+        record_checkout()
+        conn = PooledConnection(pool, pool.acquire(), scoped=True)
+        g._db_conn = conn
+    return conn
+
+
+def close_db(exc=None):
+    conn = g.pop("_db_conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
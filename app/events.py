@@ -0,0 +1,193 @@
+import json
+import logging
+import queue
+import threading
+
+from .config import (
+    EVENTS_BACKEND,
+    EVENTS_GREEN_WORKERS,
+    EVENTS_MAX_STREAMS,
+    EVENTS_REDIS_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:  # redis нужен только для EVENTS_BACKEND=redis
+    redis = None
+
+
+class Subscription:
+    def __init__(self, broker, topic, maxsize=100):
+        self.broker = broker
+        self.topic = topic
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout=None):
+        """Returns the next message or None when `timeout` expires."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """
+    In-process pub/sub fan-out. Each subscriber gets a bounded queue;
+    messages for a slow subscriber are dropped rather than blocking the
+    publisher.
+    """
+
+    def __init__(self):
+        self._topics = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, topic):
+        subscription = Subscription(self, topic)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic, message):
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+            self.published += 1
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "topics": len(self._topics),
+                "subscribers": sum(len(s) for s in self._topics.values()),
+                "published": self.published,
+                "dropped": self.dropped,
+            }
+
+
+class RedisSubscription:
+    def __init__(self, pubsub, topic):
+        self.pubsub = pubsub
+        self.topic = topic
+        pubsub.subscribe(topic)
+
+    def get(self, timeout=None):
+        message = self.pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=timeout or 0
+        )
+        if not message:
+            return None
+        return json.loads(message["data"])
+
+    def close(self):
+        self.pubsub.close()
+
+
+class RedisBroker:
+    """Fan-out through a Redis-compatible server, for multi-process setups."""
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("EVENTS_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+
+    def subscribe(self, topic):
+        return RedisSubscription(self.client.pubsub(), topic)
+
+    def publish(self, topic, message):
+        self.client.publish(topic, json.dumps(message, ensure_ascii=False))
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if EVENTS_BACKEND == "redis":
+                    _broker = RedisBroker(EVENTS_REDIS_URL)
+                else:
+                    _broker = MemoryBroker()
+    return _broker
+
+
+def streaming_unavailable(environ):
+    """
+    Why this server cannot hold SSE streams, or None. On a sync
+    single-threaded server one open stream blocks the whole worker, and the
+    memory broker only reaches subscribers in the publishing process.
+    """
+    if not (environ.get("wsgi.multithread") or EVENTS_GREEN_WORKERS):
+        return "Live updates need a threaded or async server"
+    if environ.get("wsgi.multiprocess") and EVENTS_BACKEND != "redis":
+        return "Live updates with several worker processes need EVENTS_BACKEND=redis"
+    return None
+
+
+_streams = threading.BoundedSemaphore(max(1, EVENTS_MAX_STREAMS))
+
+
+def open_stream():
+    """Takes a stream slot; False when EVENTS_MAX_STREAMS are already open."""
+    return _streams.acquire(blocking=False)
+
+
+def close_stream():
+    _streams.release()
+
+
+def slot_topic(playground_id, slot_date):
+    return f"slots:{playground_id}:{slot_date.isoformat()}"
+
+
+def subscribe_slots(playground_id, slot_date):
+    """Subscription to slot updates of a playground and date, or None if the broker fails."""
+    try:
+        return get_broker().subscribe(slot_topic(playground_id, slot_date))
+    except Exception:
+        logger.exception("Failed to subscribe to slot updates")
+        return None
+
+
+def publish_slot(playground_id, slot_date, slot_hour, categories):
+    """
+    Announces the new contents of a slot after a committed change. Failures
+    are logged only: the booking itself has already succeeded.
+    """
+    try:
+        get_broker().publish(
+            slot_topic(playground_id, slot_date),
+            {
+                "playground_id": playground_id,
+                "date": slot_date.isoformat(),
+                "hour": slot_hour,
+                "categories": list(categories),
+            },
+        )
+    except Exception:
+        logger.exception("Failed to publish slot update")
@@ -0,0 +1,99 @@
+import re
+from datetime import date, datetime
+
+from . import occupancy
+from .queries import (
+    BOOKING_DEFAULT_FIELDS,
+    DOG_CATEGORY_SQL,
+    PLAYGROUND_DETAILS_SQL,
+    user_bookings_query,
+)
+
+# Таблицы, полный просмотр которых на горячем пути считаем регрессией
+GUARDED_TABLES = {"playgrounds", "bookings", "dogs", "users", "slot_occupancy"}
+
+# "FROM bookings b", "JOIN dogs AS d": имя таблицы и необязательный алиас
+TABLE_REF_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(?!(?:ON|WHERE|JOIN|USING|"
+    r"ORDER|GROUP|LIMIT|LEFT|RIGHT|INNER|CROSS|FOR)\b)(\w+)`?)?",
+    re.IGNORECASE,
+)
+
+
+def hot_queries():
+    """(name, sql, params) for the statements on the request hot paths."""
+    today = date.today()
+    return [
+        ("playground details", PLAYGROUND_DETAILS_SQL, (1,)),
+        ("dog category", DOG_CATEGORY_SQL, (1,)),
+        ("slot counters for a day", occupancy.DAY_SQL, (1, today)),
+        # Повторяют запросы из services._book_in_transaction и routes
+        (
+            "dog double booking",
+            """
+            SELECT id FROM bookings
+            WHERE dog_id = %s AND start_time >= %s AND start_time < %s
+              AND status = 'confirmed'
+            LIMIT 1
+            """,
+            (1, today, today),
+        ),
+        (
+            "bookings of a slot",
+            """
+            SELECT id FROM bookings
+            WHERE playground_id = %s AND slot_date = %s AND slot_hour = %s
+              AND status = 'confirmed'
+            """,
+            (1, today, 10),
+        ),
+        # Тот же построитель, что и у /api/my-bookings
+        ("user bookings",
+         *user_bookings_query(1, BOOKING_DEFAULT_FIELDS)),
+        ("user bookings, next upcoming page",
+         *user_bookings_query(1, BOOKING_DEFAULT_FIELDS, "upcoming", (datetime.now(), 1))),
+        ("login by username",
+         "SELECT id, password_hash FROM users WHERE username = %s", ("user",)),
+        ("register email check",
+         "SELECT id FROM users WHERE email = %s LIMIT 1", ("user@example.com",)),
+    ]
+
+
+def table_aliases(sql):
+    """{alias or table name: table name} for the tables referenced in `sql`."""
+    aliases = {}
+    for table, alias in TABLE_REF_RE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def full_scans(plan_rows, aliases=None):
+    """
+    EXPLAIN rows that read a guarded table without an index. EXPLAIN names
+    tables by their alias in the query; `aliases` maps them back.
+    """
+    aliases = aliases or {}
+    return [
+        {**row, "table": aliases.get(row.get("table"), row.get("table"))}
+        for row in plan_rows
+        if aliases.get(row.get("table"), row.get("table")) in GUARDED_TABLES
+        and (row.get("type") or "").upper() == "ALL"
+    ]
+
+
+def check_query_plans(conn):
+    """
+    Runs EXPLAIN for every hot query and returns [(name, table, rows)] for
+    those that fall back to a full table scan. Run it against a database
+    with realistic volumes (bench/seed.py): on near-empty tables MySQL may
+    legitimately prefer a scan.
+    """
+    problems = []
+    with conn.cursor(dictionary=True) as cur:
+        for name, sql, params in hot_queries():
+            cur.execute("EXPLAIN " + sql, params)
+            for row in full_scans(cur.fetchall(), table_aliases(sql)):
+                problems.append((name, row["table"], row.get("rows")))
+    return problems
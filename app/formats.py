@@ -0,0 +1,83 @@
+import json
+import struct
+
+# Компактные представления точек карты для /api/playgrounds
+BINARY_MIMETYPE = "application/x-playgrounds"
+COLUMNS_MIMETYPE = "application/json"
+BINARY_MAGIC = b"PGB1"
+
+FLAG_DISTANCE = 1
+FLAG_DELTA_IDS = 2
+
+FORMATS = ("json", "columns", "binary")
+
+
+def negotiate_points_format(args, accept_mimetypes):
+    """
+    Picks the representation from ?format= or, failing that, the Accept
+    header. Defaults to the plain JSON list of {id, lat, lon}.
+    """
+    requested = (args.get("format") or "").lower()
+    if requested in FORMATS:
+        return requested
+    if accept_mimetypes.best_match([BINARY_MIMETYPE, "application/json"]) == BINARY_MIMETYPE:
+        return "binary"
+    return "json"
+
+
+def encode_columns(rows):
+    payload = {
+        "ids": [row["id"] for row in rows],
+        "lat": [row["lat"] for row in rows],
+        "lon": [row["lon"] for row in rows],
+    }
+    if rows and "distance" in rows[0]:
+        payload["distance"] = [row["distance"] for row in rows]
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def encode_binary(rows):
+    """
+    Little-endian layout:
+        4s  magic "PGB1"
+        u32 count
+        u32 flags (1 = distance column present, 2 = ids delta-encoded)
+        u32[count] ids
+        f32[count] lat
+        f32[count] lon
+        u32[count] distance in metres (only with flag 1)
+    Without distances rows are sorted by id and ids are stored as deltas.
+    """
+    has_distance = bool(rows) and "distance" in rows[0]
+    flags = 0
+    if has_distance:
+        flags |= FLAG_DISTANCE
+        ids = [row["id"] for row in rows]
+    else:
+        flags |= FLAG_DELTA_IDS
+        rows = sorted(rows, key=lambda row: row["id"])
+        ids = []
+        previous = 0
+        for row in rows:
+            ids.append(row["id"] - previous)
+            previous = row["id"]
+    count = len(rows)
+    parts = [
+        BINARY_MAGIC,
+        struct.pack("<II", count, flags),
+        struct.pack(f"<{count}I", *ids),
+        struct.pack(f"<{count}f", *(row["lat"] for row in rows)),
+        struct.pack(f"<{count}f", *(row["lon"] for row in rows)),
+    ]
+    if has_distance:
+        parts.append(struct.pack(f"<{count}I", *(row["distance"] for row in rows)))
+    return b"".join(parts)
+
+
+def encode_points(rows, fmt):
+    """Returns (body, mimetype) for map points in the negotiated format."""
+    if fmt == "binary":
+        return encode_binary(rows), BINARY_MIMETYPE
+    if fmt == "columns":
+        return encode_columns(rows), COLUMNS_MIMETYPE
+    return None, None
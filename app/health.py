@@ -0,0 +1,267 @@
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import mysql.connector
+
+from . import amenities, migrations, search, spatial
+from .analytics import analytics_cache
+from .cache import catalogue_cache
+from .categories import dog_categories
+from .config import (
+    DB_CONFIG,
+    DIAGNOSTICS_REFRESH_SECONDS,
+    READINESS_CACHE_SECONDS,
+    READINESS_TIMEOUT,
+)
+from .db import get_db, get_pool
+from .ratelimit import ip_limiter, username_limiter
+from .sessions import store_stats
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Last `size` DB round-trip times in milliseconds."""
+
+    def __init__(self, size=100):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, ms):
+        with self._lock:
+            self._samples.append(ms)
+
+    def stats(self):
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {"samples": 0, "last_ms": None, "avg_ms": None, "max_ms": None}
+        return {
+            "samples": len(samples),
+            "last_ms": round(samples[-1], 2),
+            "avg_ms": round(sum(samples) / len(samples), 2),
+            "max_ms": round(max(samples), 2),
+        }
+
+
+db_latency = LatencyWindow()
+
+
+def ping_db(timeout=READINESS_TIMEOUT):
+    """
+    Checks out a connection (waiting at most `timeout`), runs SELECT 1 and
+    returns the round trip in milliseconds.
+    """
+    pool = get_pool()
+    raw = pool.acquire(timeout=timeout)
+    try:
+        started = time.perf_counter()
+        cur = raw.cursor()
+        try:
+            cur.execute("SELECT 1")
+            cur.fetchall()
+        finally:
+            cur.close()
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        pool.release(raw)
+    db_latency.add(elapsed)
+    return elapsed
+
+
+_schema_current = False
+
+
+def check_schema(timeout=READINESS_TIMEOUT):
+    """
+    Migration versions the database is missing, logged as an error when
+    there are any. Once the schema is current the answer is remembered.
+    """
+    global _schema_current
+    if _schema_current:
+        return []
+    pool = get_pool()
+    raw = pool.acquire(timeout=timeout)
+    try:
+        pending = migrations.pending_versions(raw)
+    finally:
+        pool.release(raw)
+    if pending:
+        logger.error(
+            "Database schema is behind: migrations %s are not applied; run `flask migrate`",
+            pending,
+        )
+    else:
+        _schema_current = True
+    return pending
+
+
+def _check_schema_on_startup():
+    try:
+        check_schema()
+    except mysql.connector.Error as exc:
+        logger.warning("Schema check skipped, database unavailable: %s", exc)
+
+
+def check_schema_in_background():
+    """Called by create_app; the app starts even when the database is down."""
+    threading.Thread(target=_check_schema_on_startup, daemon=True).start()
+
+
+_readiness = None
+_readiness_lock = threading.Lock()
+
+
+def readiness():
+    """
+    (ready, details). The check runs at most once per READINESS_CACHE_SECONDS;
+    probes arriving meanwhile, or while a check is running, get its result.
+    """
+    global _readiness
+    cached = _readiness
+    if cached and time.monotonic() - cached[0] < READINESS_CACHE_SECONDS:
+        return cached[1], cached[2]
+    with _readiness_lock:
+        cached = _readiness
+        if cached and time.monotonic() - cached[0] < READINESS_CACHE_SECONDS:
+            return cached[1], cached[2]
+        try:
+            latency = ping_db()
+            pending = check_schema()
+            if pending:
+                result = (False, {
+                    "status": "schema_outdated",
+                    "pending_migrations": pending,
+                    "error": "Run `flask migrate`",
+                })
+            else:
+                result = (True, {"status": "ready", "db_latency_ms": round(latency, 2)})
+        except mysql.connector.Error as exc:
+            result = (False, {"status": "unavailable", "error": str(exc)})
+        _readiness = (time.monotonic(), *result)
+    return result
+
+
+def collect_db_stats():
+    """The expensive part of diagnostics; runs in the background only."""
+    started = time.perf_counter()
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("SELECT DATABASE() AS db")
+            db_row = cur.fetchone()
+            cur.execute(
+                """
+                SELECT table_name, table_rows
+                FROM information_schema.tables
+                WHERE table_schema = %s
+                """,
+                (DB_CONFIG["database"],),
+            )
+            tables = {row["table_name"]: row["table_rows"] for row in cur.fetchall()}
+            cur.execute("SELECT COUNT(*) AS total FROM playgrounds")
+            total_playgrounds = cur.fetchone()["total"]
+            cur.execute(
+                """
+                SELECT COUNT(DISTINCT district_norm) AS total
+                FROM playgrounds
+                WHERE district_norm IS NOT NULL
+                """
+            )
+            total_districts = cur.fetchone()["total"]
+            cur.execute(
+                """
+                SELECT district_norm AS district
+                FROM playgrounds
+                WHERE district_norm IS NOT NULL
+                LIMIT 5
+                """
+            )
+            sample_districts = [row["district"] for row in cur.fetchall()]
+    return {
+        "db": db_row["db"],
+        "tables": sorted(tables),
+        # Оценка InnoDB из information_schema, не точный COUNT(*)
+        "table_rows_estimate": tables,
+        "playgrounds_total": total_playgrounds,
+        "districts_total": total_districts,
+        "sample_districts": sample_districts,
+        "collect_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+_snapshot = None
+# Захват без ожидания: ровно один фоновый сбор статистики
+_refreshing = threading.Lock()
+
+
+def _refresh():
+    global _snapshot
+    try:
+        ping_db()
+        stats = collect_db_stats()
+        _snapshot = {"refreshed_at": datetime.now(), "at": time.monotonic(), "stats": stats}
+    except mysql.connector.Error:
+        logger.exception("Diagnostics refresh failed")
+    finally:
+        _refreshing.release()
+
+
+def refresh_in_background():
+    if _refreshing.acquire(blocking=False):
+        threading.Thread(target=_refresh, daemon=True).start()
+
+
+def db_snapshot():
+    """
+    Last collected DB statistics or None. A refresh starts in the background
+    when there is none yet or it is older than DIAGNOSTICS_REFRESH_SECONDS;
+    callers never wait for it.
+    """
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot["at"] > DIAGNOSTICS_REFRESH_SECONDS:
+        refresh_in_background()
+    return snapshot
+
+
+def live_stats():
+    """In-process counters; cheap enough to compute on every call."""
+    spatial_index = spatial.current_index()
+    search_index = search.current_index()
+    amenity_index = amenities.current_index()
+    return {
+        "pool": get_pool().stats(),
+        "db_latency": db_latency.stats(),
+        "caches": {
+            "catalogue": catalogue_cache.stats(),
+            "analytics": analytics_cache.stats(),
+            "dog_categories": dog_categories.stats(),
+            "sessions": store_stats(),
+        },
+        "indexes": {
+            "spatial_points": len(spatial_index) if spatial_index else None,
+            "search_documents": len(search_index.documents) if search_index else None,
+            "amenity_playgrounds": amenity_index.size if amenity_index else None,
+        },
+        "rate_limits": {
+            "username": username_limiter.stats(),
+            "ip": ip_limiter.stats(),
+        },
+    }
+
+
+def diagnostics():
+    snapshot = db_snapshot()
+    if snapshot is None:
+        result = {"status": "warming"}
+    else:
+        result = {
+            "status": "ok",
+            **snapshot["stats"],
+            "refreshed_at": snapshot["refreshed_at"].isoformat(timespec="seconds"),
+            "age_seconds": round(time.monotonic() - snapshot["at"], 1),
+        }
+    result.update(live_stats())
+    return result
@@ -0,0 +1,371 @@
+import csv
+import io
+import json
+import time
+
+from . import search
+from .migrations import ensure_schema
+from .normalize import normalize_row
+
+# Поля выгрузки data.mos.ru -> столбцы таблицы playgrounds
+FIELD_ALIASES = {
+    "global_id": "global_id",
+    "admarea": "adm_area",
+    "adm_area": "adm_area",
+    "district": "district",
+    "address": "address",
+    "parkname": "park_name",
+    "park_name": "park_name",
+    "dogparkarea": "area",
+    "area": "area",
+    "elements": "elements",
+    "lighting": "lighting",
+    "fencing": "fencing",
+    "workinghours": "working_hours",
+    "working_hours": "working_hours",
+    "photo": "photo_id",
+    "photosummer": "photo_id",
+    "photo_id": "photo_id",
+    "lat": "lat",
+    "latitude_wgs84": "lat",
+    "lon": "lon",
+    "longitude_wgs84": "lon",
+    "geodata_center": "geodata_center",
+    "geodata": "geodata",
+}
+
+IMPORT_COLUMNS = [
+    "global_id",
+    "adm_area",
+    "district",
+    "address",
+    "park_name",
+    "area",
+    "elements",
+    "lighting",
+    "fencing",
+    "working_hours",
+    "photo_id",
+    "lat",
+    "lon",
+]
+
+# Допустимые координаты: Москва с запасом
+LAT_RANGE = (55.0, 56.5)
+LON_RANGE = (36.0, 38.5)
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.upserted = 0
+        self.rejected = 0
+        self.matched = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def __str__(self):
+        rate = self.read / self.elapsed if self.elapsed else 0
+        return (
+            f"read {self.read}, upserted {self.upserted}, rejected {self.rejected}, "
+            f"matched to existing {self.matched} ({rate:.0f} rows/s)"
+        )
+
+
+def iter_json_array(fp, chunk_size=1 << 16):
+    """
+    Yields the objects of a top-level JSON array one at a time without
+    loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    raise
+                break
+            # Значение закончено, только если за ним разделитель: число или
+            # литерал на границе куска может продолжиться в следующем
+            if not eof and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+                break
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+        if eof:
+            if buffer.strip():
+                raise ValueError("Unexpected end of JSON input")
+            return
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def iter_csv_rows(fp):
+    sample = fp.read(1 << 14)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    return csv.DictReader(_chain_text(sample, fp), dialect=dialect)
+
+
+def _chain_text(prefix, fp):
+    # Дочитываем оборванную строку образца, дальше читаем файл построчно
+    yield from io.StringIO(prefix + fp.readline())
+    yield from fp
+
+
+def _plain_value(value):
+    """Flattens nested open-data values ({value=...}, [{...}]) to text."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return _plain_value(value.get("value"))
+    if isinstance(value, list):
+        parts = [_plain_value(item) for item in value]
+        return ", ".join(part for part in parts if part) or None
+    text = str(value).strip()
+    return text or None
+
+
+def _working_hours_text(value):
+    if isinstance(value, list):
+        lines = []
+        for item in value:
+            if isinstance(item, dict):
+                lines.append(f"DayOfWeek:{item.get('DayOfWeek', '')}")
+                lines.append(f"Hours:{item.get('Hours', '')}")
+        return "\n".join(lines) or None
+    return _plain_value(value)
+
+
+def _photo_text(value):
+    if isinstance(value, list):
+        lines = []
+        for item in value:
+            photo = item.get("Photo") if isinstance(item, dict) else item
+            if photo:
+                lines.append(f"photo:{photo}")
+        return "\n".join(lines) or None
+    text = _plain_value(value)
+    if text and ":" not in text:
+        return f"photo:{text}"
+    return text
+
+
+def _elements_text(value):
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False) if value else "[]"
+    return _plain_value(value)
+
+
+def _coordinates(record):
+    for key in ("geodata_center", "geodata"):
+        geo = record.get(key)
+        if isinstance(geo, str):
+            try:
+                geo = json.loads(geo)
+            except ValueError:
+                geo = None
+        if isinstance(geo, dict) and geo.get("type") == "Point":
+            lon, lat = geo["coordinates"][:2]
+            return lat, lon
+    return record.get("lat"), record.get("lon")
+
+
+def map_record(raw):
+    """
+    Converts one export record (JSON object or CSV row) into playgrounds
+    column values. Returns None when the record is invalid.
+    """
+    if isinstance(raw.get("Cells"), dict):
+        raw = {**raw["Cells"], "global_id": raw.get("global_id") or raw["Cells"].get("global_id")}
+    record = {}
+    for key, value in raw.items():
+        column = FIELD_ALIASES.get(str(key).strip().lower())
+        if column and column not in record:
+            record[column] = value
+
+    try:
+        global_id = int(record.get("global_id"))
+    except (TypeError, ValueError):
+        return None
+
+    lat, lon = _coordinates(record)
+    try:
+        lat = float(lat) if lat not in (None, "") else None
+        lon = float(lon) if lon not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+    if lat is not None and not LAT_RANGE[0] <= lat <= LAT_RANGE[1]:
+        return None
+    if lon is not None and not LON_RANGE[0] <= lon <= LON_RANGE[1]:
+        return None
+
+    row = {
+        "global_id": global_id,
+        "adm_area": _plain_value(record.get("adm_area")),
+        "district": _plain_value(record.get("district")),
+        "address": _plain_value(record.get("address")),
+        "park_name": _plain_value(record.get("park_name")),
+        "area": _plain_value(record.get("area")),
+        "elements": _elements_text(record.get("elements")),
+        "lighting": (_plain_value(record.get("lighting")) or "").lower() or None,
+        "fencing": (_plain_value(record.get("fencing")) or "").lower() or None,
+        "working_hours": _working_hours_text(record.get("working_hours")),
+        "photo_id": _photo_text(record.get("photo_id")),
+        "lat": lat,
+        "lon": lon,
+    }
+    row.update(normalize_row(row))
+    return row
+
+
+def _upsert_sql():
+    columns = IMPORT_COLUMNS + [
+        "park_name_clean", "photo_url", "district_norm", "elements_list"
+    ]
+    updates = ", ".join(
+        f"{column} = VALUES({column})" for column in columns if column != "global_id"
+    )
+    return columns, (
+        f"INSERT INTO playgrounds ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON DUPLICATE KEY UPDATE {updates}"
+    )
+
+
+def _coordinates_key(lat, lon):
+    if lat is None or lon is None:
+        return None
+    return round(float(lat), 5), round(float(lon), 5)
+
+
+class LegacyRows:
+    """
+    Playgrounds entered before the import existed have no global_id, so an
+    upsert would add them a second time. They are matched to incoming
+    records by coordinates (to ~1 m) or, failing that, by address, and get
+    the record's global_id before the batch is written.
+    """
+
+    def __init__(self, cur):
+        cur.execute(
+            "SELECT id, address, lat, lon FROM playgrounds WHERE global_id IS NULL"
+        )
+        self.by_coordinates = {}
+        self.by_address = {}
+        for playground_id, address, lat, lon in cur.fetchall():
+            key = _coordinates_key(lat, lon)
+            if key:
+                self.by_coordinates.setdefault(key, playground_id)
+            if address:
+                self.by_address.setdefault(search.normalize_text(address), playground_id)
+        self.claimed = set()
+
+    def __bool__(self):
+        return bool(self.by_coordinates or self.by_address)
+
+    def match(self, row):
+        candidates = (
+            self.by_coordinates.get(_coordinates_key(row["lat"], row["lon"])),
+            self.by_address.get(search.normalize_text(row["address"] or "")),
+        )
+        for playground_id in candidates:
+            if playground_id is not None and playground_id not in self.claimed:
+                self.claimed.add(playground_id)
+                return playground_id
+        return None
+
+    def claim(self, cur, batch):
+        """Sets global_id on legacy rows matching the batch; returns how many."""
+        global_ids = [row["global_id"] for row in batch]
+        cur.execute(
+            "SELECT global_id FROM playgrounds "
+            f"WHERE global_id IN ({', '.join(['%s'] * len(global_ids))})",
+            global_ids,
+        )
+        known = {global_id for (global_id,) in cur.fetchall()}
+        updates = []
+        for row in batch:
+            if row["global_id"] in known:
+                continue
+            playground_id = self.match(row)
+            if playground_id is not None:
+                updates.append((row["global_id"], playground_id))
+        if updates:
+            cur.executemany(
+                "UPDATE playgrounds SET global_id = %s WHERE id = %s AND global_id IS NULL",
+                updates,
+            )
+        return len(updates)
+
+
+def import_records(conn, records, batch_size=1000, progress=None):
+    """
+    Upserts records into playgrounds by global_id in batched executemany
+    calls. Memory use is bounded by `batch_size`, whatever the input size.
+    Existing rows without a global_id are matched first (see LegacyRows).
+    """
+    ensure_schema(conn)
+    columns, sql = _upsert_sql()
+    stats = ImportStats()
+    batch = []
+    with conn.cursor() as cur:
+        legacy = LegacyRows(cur)
+
+    def flush():
+        with conn.cursor() as cur:
+            if legacy:
+                stats.matched += legacy.claim(cur, batch)
+            cur.executemany(sql, [[row[column] for column in columns] for row in batch])
+        conn.commit()
+        search.update_documents(row["global_id"] for row in batch)
+        stats.upserted += len(batch)
+        batch.clear()
+        if progress:
+            progress(stats)
+
+    for raw in records:
+        stats.read += 1
+        row = map_record(raw)
+        if row is None:
+            stats.rejected += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
+
+
+def iter_file_records(path):
+    """Opens a data.mos.ru export (.json or .csv) and yields raw records."""
+    encoding = "utf-8-sig"
+    if str(path).lower().endswith(".csv"):
+        with open(path, encoding=encoding, newline="") as fp:
+            yield from iter_csv_rows(fp)
+    else:
+        with open(path, encoding=encoding) as fp:
+            yield from iter_json_array(fp)
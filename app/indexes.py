@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+
+class SharedIndex:
+    """
+    Process-wide in-memory index (search, spatial grid, amenities). It is
+    built on first use; past `ttl` seconds it keeps serving while a fresh
+    copy is built in a background thread, so imports run by other processes
+    (flask import-playgrounds) show up without a restart. `build()` returns
+    an object with a `built_at` monotonic timestamp.
+    """
+
+    def __init__(self, name, build, ttl):
+        self.name = name
+        self._build = build
+        self.ttl = ttl
+        self._index = None
+        self._lock = threading.Lock()
+        # Не более одной фоновой пересборки: захват без ожидания атомарен
+        self._refreshing = threading.Lock()
+
+    def get(self):
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+                index = self._index
+        elif time.monotonic() - index.built_at > self.ttl:
+            self.refresh_in_background()
+        return index
+
+    def _refresh(self):
+        try:
+            if self._index is None:
+                self.get()
+            else:
+                index = self._build()
+                with self._lock:
+                    self._index = index
+        except mysql.connector.Error:
+            logger.exception("%s build failed", self.name)
+        finally:
+            self._refreshing.release()
+
+    def refresh_in_background(self):
+        if self._refreshing.acquire(blocking=False):
+            threading.Thread(target=self._refresh, daemon=True).start()
+
+    def current(self):
+        """The built index or None, without triggering a build."""
+        return self._index
+
+    def install(self, index):
+        """Replaces the index, e.g. with one built by the async app."""
+        with self._lock:
+            self._index = index
+
+    def invalidate(self):
+        """Drops the index; it is rebuilt on the next query."""
+        with self._lock:
+            self._index = None
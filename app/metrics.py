@@ -0,0 +1,343 @@
+import logging
+import re
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+
+from .cache import catalogue_cache
+from .config import METRICS_ENABLED, SLOW_QUERY_LOG_LIMIT, SLOW_REQUEST_MS
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_whitespace = re.compile(r"\s+")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            counts, total = self._values.get(label_values, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[label_values] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        names = self.labels + ("le",)
+        for label_values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(names, label_values + (bound,)),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", _format_labels(self.labels, label_values), round(total, 6)
+            yield f"{self.name}_count", _format_labels(self.labels, label_values), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() returns [(name, kind, help, value)] computed at scrape time."""
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        for collector in self.collectors:
+            for name, kind, help_text, value in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Request latency by endpoint",
+    labels=("endpoint", "method", "status"),
+))
+request_checkouts = registry.register(Histogram(
+    "http_request_db_checkouts",
+    "Pool connections checked out per request",
+    labels=("endpoint",),
+    buckets=COUNT_BUCKETS,
+))
+request_queries = registry.register(Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request",
+    labels=("endpoint",),
+    buckets=COUNT_BUCKETS,
+))
+query_duration = registry.register(Histogram(
+    "db_query_duration_seconds",
+    "Duration of single SQL statements, execute plus fetch",
+    labels=("endpoint",),
+))
+rows_fetched = registry.register(Counter(
+    "db_rows_fetched_total",
+    "Rows fetched from MySQL",
+    labels=("endpoint",),
+))
+slow_requests = registry.register(Counter(
+    "http_slow_requests_total",
+    "Requests slower than SLOW_REQUEST_MS",
+    labels=("endpoint",),
+))
+
+
+class RequestTrace:
+    """What one request did with the database."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.checkouts = 0
+        self.queries = []
+        self.status = 500
+
+    def add_query(self, statement):
+        query = {"sql": statement, "duration": 0.0, "rows": 0}
+        self.queries.append(query)
+        return query
+
+
+def current_trace():
+    if not has_request_context():
+        return None
+    return g.get("_trace")
+
+
+def record_checkout():
+    trace = current_trace()
+    if trace is not None:
+        trace.checkouts += 1
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy that times statements and counts fetched rows into the
+    current request trace.
+    """
+
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+        self._query = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._cursor.__exit__(exc_type, exc_value, traceback)
+
+    def _timed(self, statement, call, *args, **kwargs):
+        self._query = self._trace.add_query(statement)
+        started = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            self._query["duration"] += time.perf_counter() - started
+
+    def _fetched(self, call, count, *args):
+        started = time.perf_counter()
+        result = call(*args)
+        if self._query is not None:
+            self._query["duration"] += time.perf_counter() - started
+            self._query["rows"] += count(result)
+        return result
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._timed(operation, self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._timed(
+            operation, self._cursor.executemany, operation, seq_params, *args, **kwargs
+        )
+
+    def fetchone(self):
+        return self._fetched(self._cursor.fetchone, lambda row: 0 if row is None else 1)
+
+    def fetchall(self):
+        return self._fetched(self._cursor.fetchall, len)
+
+    def fetchmany(self, *args):
+        return self._fetched(self._cursor.fetchmany, len, *args)
+
+
+def wrap_cursor(cursor):
+    trace = current_trace()
+    if trace is None:
+        return cursor
+    return InstrumentedCursor(cursor, trace)
+
+
+def endpoint_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def start_trace():
+    g._trace = RequestTrace()
+
+
+def remember_status(response):
+    trace = current_trace()
+    if trace is not None:
+        trace.status = response.status_code
+    return response
+
+
+def finish_trace(exc=None):
+    trace = g.pop("_trace", None)
+    if trace is None:
+        return
+    elapsed = time.perf_counter() - trace.started
+    endpoint = endpoint_label()
+    labels = (endpoint,)
+    request_duration.observe((endpoint, request.method, str(trace.status)), elapsed)
+    request_checkouts.observe(labels, trace.checkouts)
+    request_queries.observe(labels, len(trace.queries))
+    total_rows = 0
+    for query in trace.queries:
+        query_duration.observe(labels, query["duration"])
+        total_rows += query["rows"]
+    if total_rows:
+        rows_fetched.inc(labels, total_rows)
+
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        slow_requests.inc(labels)
+        statements = [
+            f"  {query['duration'] * 1000:.1f}ms rows={query['rows']} "
+            f"{_whitespace.sub(' ', query['sql']).strip()}"
+            for query in trace.queries[:SLOW_QUERY_LOG_LIMIT]
+        ]
+        logger.warning(
+            "Slow request %s %s: %.1fms, status %s, %d checkouts, %d queries\n%s",
+            request.method,
+            request.full_path.rstrip("?"),
+            elapsed * 1000,
+            trace.status,
+            trace.checkouts,
+            len(trace.queries),
+            "\n".join(statements),
+        )
+
+
+def pool_metrics():
+    from .db import get_pool  # db сам импортирует metrics
+
+    stats = get_pool().stats()
+    gauges = ("idle", "checked_out", "overflow")
+    counters = (
+        "connections_created",
+        "connections_closed",
+        "checkouts",
+        "checkout_waits",
+        "checkout_timeouts",
+        "failed_pings",
+        "recycled",
+    )
+    samples = [(f"db_pool_{name}", "gauge", f"Pool {name}", stats[name]) for name in gauges]
+    samples += [
+        (f"db_pool_{name}_total", "counter", f"Pool {name}", stats[name]) for name in counters
+    ]
+    return samples
+
+
+def cache_metrics():
+    stats = catalogue_cache.stats()
+    return [
+        ("catalogue_cache_entries", "gauge", "Cached catalogue responses", stats["entries"]),
+        ("catalogue_cache_hits_total", "counter", "Catalogue cache hits", stats["hits"]),
+        ("catalogue_cache_misses_total", "counter", "Catalogue cache misses", stats["misses"]),
+    ]
+
+
+registry.add_collector(pool_metrics)
+registry.add_collector(cache_metrics)
+
+
+def metrics_view():
+    return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_app(app):
+    """Enables per-request tracing and /metrics when METRICS_ENABLED is set."""
+    if not METRICS_ENABLED:
+        return
+    app.before_request(start_trace)
+    app.after_request(remember_status)
+    app.teardown_request(finish_trace)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
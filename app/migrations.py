@@ -0,0 +1,341 @@
+import time
+
+# Версионированные миграции схемы. Текст уже выпущенных (попавших в main)
+# миграций не меняем, включая общие с командами rebuild-* константы вроде
+# BOOKING_STATS_BACKFILL: новое изменение схемы — новая запись в конце
+# MIGRATIONS.
+#
+# Приложение схему не мигрирует: после обновления кода до запуска воркеров
+# нужен `flask migrate`. Пока миграции не применены, /readyz отвечает 503,
+# а при старте в лог пишется ошибка (см. health.check_schema).
+
+MIGRATIONS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(128) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def _table_exists(cur, table):
+    cur.execute(
+        """
+        SELECT COUNT(*)
+        FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+        """,
+        (table,),
+    )
+    return bool(cur.fetchone()[0])
+
+
+def _column_exists(cur, table, column):
+    cur.execute(
+        """
+        SELECT COUNT(*)
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """,
+        (table, column),
+    )
+    return bool(cur.fetchone()[0])
+
+
+def _index_exists(cur, table, index):
+    cur.execute(
+        """
+        SELECT COUNT(*)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """,
+        (table, index),
+    )
+    return bool(cur.fetchone()[0])
+
+
+def add_column(table, column, definition):
+    """Step that adds a column unless an older ensure_* helper already did."""
+
+    def step(cur):
+        if not _column_exists(cur, table, column):
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    return step
+
+
+def add_index(table, index, columns, unique=False):
+    def step(cur):
+        if not _index_exists(cur, table, index):
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            cur.execute(f"CREATE {kind} {index} ON {table} ({columns})")
+
+    return step
+
+
+BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(64) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS breed_categories (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        code VARCHAR(32) NOT NULL UNIQUE,
+        name VARCHAR(128) NOT NULL
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+    """
+    INSERT IGNORE INTO breed_categories (code, name) VALUES
+        ('SMALL', 'Декоративные'),
+        ('STANDARD', 'Стандартные'),
+        ('ACTIVE', 'Активные'),
+        ('HIGH_RISK', 'Служебные / Бойцовские')
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dogs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        category_id INT NOT NULL,
+        name VARCHAR(128) NOT NULL,
+        breed VARCHAR(128) NULL,
+        CONSTRAINT fk_dogs_user FOREIGN KEY (user_id) REFERENCES users (id),
+        CONSTRAINT fk_dogs_category FOREIGN KEY (category_id)
+            REFERENCES breed_categories (id)
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS playgrounds (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        adm_area VARCHAR(255) NULL,
+        district VARCHAR(255) NULL,
+        address TEXT NULL,
+        park_name TEXT NULL,
+        area VARCHAR(64) NULL,
+        elements TEXT NULL,
+        lighting VARCHAR(32) NULL,
+        fencing VARCHAR(32) NULL,
+        working_hours TEXT NULL,
+        photo_id TEXT NULL,
+        lat DECIMAL(10, 7) NULL,
+        lon DECIMAL(10, 7) NULL
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        playground_id INT NOT NULL,
+        dog_id INT NOT NULL,
+        start_time DATETIME NOT NULL,
+        end_time DATETIME NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'confirmed',
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT fk_bookings_playground FOREIGN KEY (playground_id)
+            REFERENCES playgrounds (id),
+        CONSTRAINT fk_bookings_dog FOREIGN KEY (dog_id) REFERENCES dogs (id)
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+]
+
+NORMALIZE_STEPS = [
+    add_column("playgrounds", "park_name_clean", "VARCHAR(512) NULL"),
+    add_column("playgrounds", "photo_url", "VARCHAR(255) NULL"),
+    add_column("playgrounds", "district_norm", "VARCHAR(255) NULL"),
+    add_column("playgrounds", "elements_list", "JSON NULL"),
+    add_index("playgrounds", "idx_playgrounds_district_norm", "district_norm"),
+]
+
+IMPORT_KEY_STEPS = [
+    add_column("playgrounds", "global_id", "BIGINT NULL"),
+    add_index("playgrounds", "uq_playgrounds_global_id", "global_id", unique=True),
+]
+
+OCCUPANCY_STEPS = [
+    """
+    CREATE TABLE IF NOT EXISTS slot_occupancy (
+        playground_id INT NOT NULL,
+        slot_date DATE NOT NULL,
+        slot_hour TINYINT NOT NULL,
+        small_count INT NOT NULL DEFAULT 0,
+        standard_count INT NOT NULL DEFAULT 0,
+        active_count INT NOT NULL DEFAULT 0,
+        high_risk_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (playground_id, slot_date, slot_hour)
+    )
+    """,
+]
+
+HOT_QUERY_INDEX_STEPS = [
+    # Карта и поиск: район + фильтры освещения/ограждения
+    add_index(
+        "playgrounds",
+        "idx_playgrounds_district_amenities",
+        "district_norm, lighting, fencing",
+    ),
+    # Слот брони как хранимые вычисляемые столбцы, чтобы не считать
+    # DATE()/HOUR() по всей таблице
+    add_column(
+        "bookings", "slot_date", "DATE GENERATED ALWAYS AS (DATE(start_time)) STORED"
+    ),
+    add_column(
+        "bookings", "slot_hour", "TINYINT GENERATED ALWAYS AS (HOUR(start_time)) STORED"
+    ),
+    add_index(
+        "bookings",
+        "idx_bookings_slot",
+        "playground_id, slot_date, slot_hour, status",
+    ),
+    add_index(
+        "bookings",
+        "idx_bookings_playground_start",
+        "playground_id, start_time, status",
+    ),
+    # Двойная запись собаки и история броней пользователя
+    add_index("bookings", "idx_bookings_dog_start", "dog_id, start_time"),
+    add_index("dogs", "idx_dogs_user", "user_id"),
+    add_index("users", "idx_users_username", "username"),
+    add_index("users", "idx_users_email", "email"),
+]
+
+BOOKING_STATS_DDL = """
+CREATE TABLE IF NOT EXISTS booking_stats (
+    playground_id INT NOT NULL,
+    month DATE NOT NULL,
+    weekday TINYINT NOT NULL,
+    slot_hour TINYINT NOT NULL,
+    small_count INT NOT NULL DEFAULT 0,
+    standard_count INT NOT NULL DEFAULT 0,
+    active_count INT NOT NULL DEFAULT 0,
+    high_risk_count INT NOT NULL DEFAULT 0,
+    full_slots INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (playground_id, month, weekday, slot_hour),
+    INDEX idx_booking_stats_month (month)
+)
+"""
+
+# Заполнение booking_stats из bookings и slot_occupancy; этими же запросами
+# пользуется analytics.rebuild
+BOOKING_STATS_BACKFILL = [
+    """
+    INSERT INTO booking_stats
+        (playground_id, month, weekday, slot_hour,
+         small_count, standard_count, active_count, high_risk_count)
+    SELECT b.playground_id,
+           DATE_FORMAT(b.slot_date, '%Y-%m-01'),
+           WEEKDAY(b.slot_date) + 1,
+           b.slot_hour,
+           SUM(bc.code = 'SMALL'),
+           SUM(bc.code = 'STANDARD'),
+           SUM(bc.code = 'ACTIVE'),
+           SUM(bc.code = 'HIGH_RISK')
+    FROM bookings b
+    JOIN dogs d ON b.dog_id = d.id
+    JOIN breed_categories bc ON d.category_id = bc.id
+    WHERE b.status = 'confirmed'
+    GROUP BY b.playground_id, DATE_FORMAT(b.slot_date, '%Y-%m-01'),
+             WEEKDAY(b.slot_date), b.slot_hour
+    """,
+    # Заполненный слот — тот, куда evaluate_slot не пустит ещё одну собаку
+    # той же категории
+    """
+    INSERT INTO booking_stats
+        (playground_id, month, weekday, slot_hour, full_slots)
+    SELECT playground_id,
+           DATE_FORMAT(slot_date, '%Y-%m-01'),
+           WEEKDAY(slot_date) + 1,
+           slot_hour,
+           COUNT(*)
+    FROM slot_occupancy
+    WHERE high_risk_count >= 2
+       OR small_count >= 8
+       OR standard_count + active_count >= 8
+    GROUP BY playground_id, DATE_FORMAT(slot_date, '%Y-%m-01'),
+             WEEKDAY(slot_date), slot_hour
+    ON DUPLICATE KEY UPDATE full_slots = VALUES(full_slots)
+    """,
+]
+
+BOOKING_STATS_STEPS = [
+    BOOKING_STATS_DDL,
+    "DELETE FROM booking_stats",
+    *BOOKING_STATS_BACKFILL,
+]
+
+# (version, name, steps); шаг — SQL-строка или функция step(cursor)
+MIGRATIONS = [
+    (1, "base schema", BASE_SCHEMA),
+    (2, "normalized playground columns", NORMALIZE_STEPS),
+    (3, "import key global_id", IMPORT_KEY_STEPS),
+    (4, "slot occupancy counters", OCCUPANCY_STEPS),
+    (5, "indexes for hot queries", HOT_QUERY_INDEX_STEPS),
+    (6, "booking analytics rollup", BOOKING_STATS_STEPS),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(conn):
+    with conn.cursor() as cur:
+        if not _table_exists(cur, "schema_migrations"):
+            return set()
+        cur.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cur.fetchall()}
+
+
+def pending_migrations(conn):
+    applied = applied_versions(conn)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def pending_versions(conn):
+    """Versions the database is missing; the app needs `flask migrate` if any."""
+    return [version for version, _, _ in pending_migrations(conn)]
+
+
+def migrate(conn, target=None, progress=None):
+    """
+    Applies pending migrations in version order up to `target` and records
+    each in schema_migrations. Steps are idempotent, so a migration that
+    failed halfway (MySQL DDL is not transactional) can simply be re-run.
+    Returns the list of applied versions.
+    """
+    pending = pending_migrations(conn)
+    applied = []
+    if not pending:
+        return applied
+    with conn.cursor() as cur:
+        cur.execute(MIGRATIONS_TABLE_DDL)
+        for version, name, steps in pending:
+            if target is not None and version > target:
+                break
+            started = time.perf_counter()
+            for step in steps:
+                if callable(step):
+                    step(cur)
+                else:
+                    cur.execute(step)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+            conn.commit()
+            applied.append(version)
+            if progress:
+                progress(version, name, time.perf_counter() - started)
+    return applied
+
+
+_migrated = False
+
+
+def ensure_schema(conn):
+    """Runs pending migrations once per process; cheap after the first call."""
+    global _migrated
+    if not _migrated:
+        migrate(conn)
+        _migrated = True
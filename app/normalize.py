@@ -0,0 +1,131 @@
+import json
+import re
+
+from .migrations import ensure_schema
+from .services import clean_park_name, parse_photo_url
+
+# Столбцы с предвычисленными значениями в таблице playgrounds
+# (создаются миграцией 2, см. app/migrations.py)
+NORMALIZED_COLUMNS = ("park_name_clean", "photo_url", "district_norm", "elements_list")
+
+ELEMENT_TYPE_RE = re.compile(r"ElementType\s*[:=]\s*([^,;\n}\]]+)")
+VALUE_RE = re.compile(r"value\s*=\s*([^,;\n}\]]+)")
+
+
+def normalize_district(raw_district):
+    if not raw_district:
+        return None
+    district = " ".join(raw_district.split())
+    return district or None
+
+
+def _element_name(item):
+    if isinstance(item, dict):
+        for key in ("ElementType", "element_type", "value", "name"):
+            if item.get(key):
+                return str(item[key])
+        return None
+    return str(item) if item else None
+
+
+def parse_elements(raw_elements):
+    """
+    Parses the raw `elements` text of the open-data export into a list of
+    element type names. Accepts JSON arrays, `{ElementType=...}` records and
+    plain newline/semicolon separated text.
+    """
+    if not raw_elements:
+        return []
+    raw_elements = raw_elements.strip()
+    if raw_elements in ("", "[]"):
+        return []
+
+    names = None
+    try:
+        parsed = json.loads(raw_elements)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, list):
+        names = [_element_name(item) for item in parsed]
+    else:
+        names = ELEMENT_TYPE_RE.findall(raw_elements) or VALUE_RE.findall(raw_elements)
+        if not names:
+            names = re.split(r"[\n;]+", raw_elements)
+
+    result = []
+    for name in names:
+        name = " ".join((name or "").split()).strip("[]{}\"' ")
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def normalize_row(row):
+    """Computes the normalized column values for one playgrounds row."""
+    return {
+        "park_name_clean": clean_park_name(row.get("park_name")),
+        "photo_url": parse_photo_url(row.get("photo_id")),
+        "district_norm": normalize_district(row.get("district")),
+        "elements_list": json.dumps(
+            parse_elements(row.get("elements")), ensure_ascii=False
+        ),
+    }
+
+
+def normalize_playgrounds(conn, batch_size=1000, ids=None, progress=None):
+    """
+    Fills the normalized columns in batches keyed by id. With `ids` only
+    those playgrounds are processed. Returns the number of updated rows.
+    """
+    ensure_schema(conn)
+    update_sql = f"""
+        UPDATE playgrounds
+        SET {", ".join(f"{name} = %s" for name in NORMALIZED_COLUMNS)}
+        WHERE id = %s
+    """
+    id_list = sorted(ids) if ids is not None else None
+    last_id = 0
+    offset = 0
+    updated = 0
+    while True:
+        with conn.cursor(dictionary=True) as cur:
+            if id_list is None:
+                cur.execute(
+                    """
+                    SELECT id, park_name, photo_id, district, elements
+                    FROM playgrounds
+                    WHERE id > %s
+                    ORDER BY id
+                    LIMIT %s
+                    """,
+                    (last_id, batch_size),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+            else:
+                chunk = id_list[offset:offset + batch_size]
+                if not chunk:
+                    break
+                offset += len(chunk)
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cur.execute(
+                    f"""
+                    SELECT id, park_name, photo_id, district, elements
+                    FROM playgrounds
+                    WHERE id IN ({placeholders})
+                    """,
+                    chunk,
+                )
+                rows = cur.fetchall()
+
+        if rows:
+            params = [[*normalize_row(row).values(), row["id"]] for row in rows]
+            with conn.cursor() as cur:
+                cur.executemany(update_sql, params)
+            conn.commit()
+            updated += len(rows)
+            if progress:
+                progress(updated)
+    return updated
@@ -0,0 +1,223 @@
+from .config import SLOT_HOURS
+from .migrations import ensure_schema
+
+# Столбец счётчика для каждой категории собак
+CATEGORY_COLUMNS = {
+    "SMALL": "small_count",
+    "STANDARD": "standard_count",
+    "ACTIVE": "active_count",
+    "HIGH_RISK": "high_risk_count",
+}
+
+COUNT_COLUMNS_SQL = ", ".join(CATEGORY_COLUMNS.values())
+
+
+def row_to_categories(row):
+    """
+    Expands per-category counters into the list form evaluate_slot expects.
+    """
+    categories = []
+    if not row:
+        return categories
+    for code, column in CATEGORY_COLUMNS.items():
+        categories.extend([code] * int(row[column] or 0))
+    return categories
+
+
+DAY_SQL = f"""
+    SELECT slot_hour, {COUNT_COLUMNS_SQL}
+    FROM slot_occupancy
+    WHERE playground_id = %s AND slot_date = %s
+"""
+
+
+def day_from_rows(rows):
+    by_hour = {hour: [] for hour in SLOT_HOURS}
+    for row in rows:
+        hour = int(row["slot_hour"])
+        if hour in by_hour:
+            by_hour[hour] = row_to_categories(row)
+    return by_hour
+
+
+def fetch_day(cur, playground_id, slot_date):
+    cur.execute(DAY_SQL, (playground_id, slot_date))
+    return day_from_rows(cur.fetchall())
+
+
+def fetch_range(cur, playground_id, start_date, end_date):
+    """
+    Returns {(slot_date, slot_hour): counts} for every occupied slot in the
+    inclusive date range, with counts ordered like CATEGORY_COLUMNS.
+    """
+    cur.execute(
+        f"""
+        SELECT slot_date, slot_hour, {COUNT_COLUMNS_SQL}
+        FROM slot_occupancy
+        WHERE playground_id = %s AND slot_date BETWEEN %s AND %s
+        """,
+        (playground_id, start_date, end_date),
+    )
+    return {
+        (row["slot_date"], int(row["slot_hour"])): tuple(
+            int(row[column] or 0) for column in CATEGORY_COLUMNS.values()
+        )
+        for row in cur.fetchall()
+    }
+
+
+def fetch_many(cur, playground_ids, slot_date, from_hour, to_hour):
+    """
+    Returns {(playground_id, slot_hour): counts} for occupied slots of many
+    playgrounds on one day, in a single query.
+    """
+    if not playground_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(playground_ids))
+    cur.execute(
+        f"""
+        SELECT playground_id, slot_hour, {COUNT_COLUMNS_SQL}
+        FROM slot_occupancy
+        WHERE playground_id IN ({placeholders})
+          AND slot_date = %s
+          AND slot_hour BETWEEN %s AND %s
+        """,
+        (*playground_ids, slot_date, from_hour, to_hour),
+    )
+    return {
+        (row["playground_id"], int(row["slot_hour"])): tuple(
+            int(row[column] or 0) for column in CATEGORY_COLUMNS.values()
+        )
+        for row in cur.fetchall()
+    }
+
+
+def fetch_slot(cur, playground_id, slot_date, slot_hour, for_update=False):
+    query = f"""
+        SELECT {COUNT_COLUMNS_SQL}
+        FROM slot_occupancy
+        WHERE playground_id = %s AND slot_date = %s AND slot_hour = %s
+    """
+    if for_update:
+        query += " FOR UPDATE"
+    cur.execute(query, (playground_id, slot_date, slot_hour))
+    return row_to_categories(cur.fetchone())
+
+
+def lock_slot(cur, playground_id, slot_date, slot_hour):
+    """
+    Creates the slot row if needed and locks it until the transaction ends,
+    so concurrent bookings of one slot are serialized. Returns the current
+    categories in the slot.
+    """
+    cur.execute(
+        """
+        INSERT INTO slot_occupancy (playground_id, slot_date, slot_hour)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE slot_hour = slot_hour
+        """,
+        (playground_id, slot_date, slot_hour),
+    )
+    return fetch_slot(cur, playground_id, slot_date, slot_hour, for_update=True)
+
+
+def lock_slots(cur, playground_id, slots):
+    """
+    lock_slot for many (slot_date, slot_hour) pairs of one playground in two
+    statements. Rows are created and locked in key order. Returns
+    {(slot_date, slot_hour): categories}.
+    """
+    slots = sorted(set(slots))
+    if not slots:
+        return {}
+    values = ", ".join(["(%s, %s, %s)"] * len(slots))
+    params = [value for slot in slots for value in (playground_id, *slot)]
+    cur.execute(
+        f"""
+        INSERT INTO slot_occupancy (playground_id, slot_date, slot_hour)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE slot_hour = slot_hour
+        """,
+        params,
+    )
+    pairs = ", ".join(["(%s, %s)"] * len(slots))
+    cur.execute(
+        f"""
+        SELECT slot_date, slot_hour, {COUNT_COLUMNS_SQL}
+        FROM slot_occupancy
+        WHERE playground_id = %s AND (slot_date, slot_hour) IN ({pairs})
+        FOR UPDATE
+        """,
+        (playground_id, *(value for slot in slots for value in slot)),
+    )
+    locked = {slot: [] for slot in slots}
+    for row in cur.fetchall():
+        locked[(row["slot_date"], int(row["slot_hour"]))] = row_to_categories(row)
+    return locked
+
+
+def adjust(cur, playground_id, slot_date, slot_hour, category_code, delta):
+    """
+    Adds `delta` to the slot counter of a category. Must run in the same
+    transaction as the booking insert or status change it mirrors.
+    """
+    column = CATEGORY_COLUMNS[category_code]
+    cur.execute(
+        f"""
+        INSERT INTO slot_occupancy (playground_id, slot_date, slot_hour, {column})
+        VALUES (%s, %s, %s, GREATEST(%s, 0))
+        ON DUPLICATE KEY UPDATE {column} = GREATEST({column} + %s, 0)
+        """,
+        (playground_id, slot_date, slot_hour, delta, delta),
+    )
+
+
+def adjust_many(cur, playground_id, slots, category_code, delta):
+    """adjust() for several slots of one playground in a single statement."""
+    if not slots:
+        return
+    column = CATEGORY_COLUMNS[category_code]
+    values = ", ".join(["(%s, %s, %s, GREATEST(%s, 0))"] * len(slots))
+    params = [
+        value
+        for slot_date, slot_hour in slots
+        for value in (playground_id, slot_date, slot_hour, delta)
+    ]
+    cur.execute(
+        f"""
+        INSERT INTO slot_occupancy (playground_id, slot_date, slot_hour, {column})
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE {column} = GREATEST({column} + %s, 0)
+        """,
+        (*params, delta),
+    )
+
+
+def rebuild(conn):
+    """
+    Recomputes slot_occupancy from confirmed bookings. Returns the number of
+    slot rows written.
+    """
+    sums = ",\n".join(
+        f"SUM(bc.code = '{code}') AS {column}"
+        for code, column in CATEGORY_COLUMNS.items()
+    )
+    ensure_schema(conn)
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM slot_occupancy")
+        cur.execute(
+            f"""
+            INSERT INTO slot_occupancy
+                (playground_id, slot_date, slot_hour, {COUNT_COLUMNS_SQL})
+            SELECT b.playground_id, b.slot_date, b.slot_hour,
+                   {sums}
+            FROM bookings b
+            JOIN dogs d ON b.dog_id = d.id
+            JOIN breed_categories bc ON d.category_id = bc.id
+            WHERE b.status = 'confirmed'
+            GROUP BY b.playground_id, b.slot_date, b.slot_hour
+            """
+        )
+        written = cur.rowcount
+    conn.commit()
+    return written
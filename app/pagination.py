@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import jsonify, request
+
+from .config import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
+
+
+class PageError(ValueError):
+    pass
+
+
+def parse_limit(raw, default=PAGE_DEFAULT_LIMIT, maximum=PAGE_MAX_LIMIT):
+    if raw in (None, ""):
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PageError("Invalid limit") from None
+    if limit < 1:
+        raise PageError("Invalid limit")
+    return min(limit, maximum)
+
+
+def encode_cursor(values):
+    """Opaque cursor for the keyset (sort value(s), id) of the last row."""
+    plain = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(plain, ensure_ascii=False, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, types):
+    """
+    Keyset values of a cursor made by encode_cursor. `types` gives the
+    expected type of each value, e.g. (datetime, int); anything else is a
+    PageError.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        for position, expected in enumerate(types):
+            value = values[position]
+            if expected is datetime:
+                values[position] = datetime.fromisoformat(value)
+            elif type(value) is not expected:
+                raise ValueError
+    except (ValueError, TypeError):
+        raise PageError("Invalid cursor") from None
+    return values
+
+
+def parse_fields(raw, allowed, default):
+    """
+    `fields=a,b` projection. Unknown names are an error; `id` is always
+    included because cursors are built from it.
+    """
+    if not raw:
+        return list(default)
+    fields = []
+    for name in raw.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise PageError(f"Unknown field: {name}")
+        if name not in fields:
+            fields.append(name)
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+
+def paginated(rows, limit, cursor_of, fields):
+    """
+    JSON list of the first `limit` rows projected to `fields`. The query
+    fetches one extra row; if it came back, the next page is advertised
+    through X-Next-Cursor and a Link header so the body stays a plain list.
+    """
+    page = rows[:limit]
+    response = jsonify([{field: row[field] for field in fields} for row in page])
+    if len(rows) > limit:
+        cursor = encode_cursor(cursor_of(page[-1]))
+        params = {key: value for key, value in request.args.items() if key != "after"}
+        params["after"] = cursor
+        response.headers["X-Next-Cursor"] = cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(params)}>; rel="next"'
+    return response
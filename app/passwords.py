@@ -0,0 +1,100 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .config import (
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_METHOD,
+    PASSWORD_HASH_TIMEOUT,
+    PASSWORD_HASH_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Exception):
+    """All hashing slots are taken; the caller should answer 503."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(1, PASSWORD_HASH_MAX_PENDING))
+
+
+def get_executor():
+    """Process pool for hashing, or None when PASSWORD_HASH_WORKERS=0 (inline)."""
+    global _executor
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Пул создаётся из потока запроса: fork скопировал бы
+                # захваченные другими потоками блокировки, поэтому forkserver
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context(
+                    "forkserver" if "forkserver" in methods else "spawn"
+                )
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS, mp_context=context
+                )
+    return _executor
+
+
+def _run(func, *args):
+    # Ограничиваем число задач в очереди: при всплеске логинов запросы
+    # получают 503, а не копят минуты работы для пула
+    if not _pending.acquire(timeout=PASSWORD_HASH_TIMEOUT):
+        raise HashingBusy()
+    try:
+        executor = get_executor()
+        if executor is None:
+            return func(*args)
+        future = executor.submit(func, *args)
+        try:
+            return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+        except FutureTimeout:
+            future.cancel()
+            raise HashingBusy() from None
+    except BrokenProcessPool:
+        # Воркер умер: пул больше не принимает задачи, создаём новый
+        logger.exception("Password hashing pool is broken; recreating it")
+        _reset_executor(executor)
+        raise HashingBusy() from None
+    finally:
+        _pending.release()
+
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=1)
+def method_prefix():
+    """
+    Parameter prefix ("scrypt:32768:8:1") that hashes made with the
+    configured method carry; werkzeug expands short names like "scrypt".
+    """
+    return generate_password_hash("", method=PASSWORD_HASH_METHOD).split("$", 1)[0]
+
+
+def needs_rehash(password_hash):
+    return password_hash.split("$", 1)[0] != method_prefix()
@@ -0,0 +1,97 @@
+# SQL, общий для синхронных (Flask) и асинхронных (ASGI) эндпоинтов чтения
+
+DISTRICTS_SQL = """
+    SELECT DISTINCT district_norm AS district
+    FROM playgrounds
+    WHERE district_norm IS NOT NULL
+    ORDER BY district_norm
+"""
+
+PLAYGROUND_DETAILS_SQL = """
+    SELECT id, adm_area, district_norm AS district, address,
+           park_name_clean AS park_name, area, elements, elements_list,
+           lighting, fencing, working_hours, photo_id, photo_url, lat, lon
+    FROM playgrounds
+    WHERE id = %s
+"""
+
+DOG_CATEGORY_SQL = """
+    SELECT bc.code AS category_code
+    FROM dogs d
+    JOIN breed_categories bc ON d.category_id = bc.id
+    WHERE d.id = %s
+"""
+
+
+# Поля списков с постраничной выдачей: имя в ответе -> выражение SQL
+BOOKING_FIELDS = {
+    "id": "b.id",
+    "start_time": "b.start_time",
+    "end_time": "b.end_time",
+    "status": "b.status",
+    "dog_id": "b.dog_id",
+    "dog_name": "d.name",
+    "playground_id": "b.playground_id",
+    "park_name": "p.park_name_clean",
+    "address": "p.address",
+}
+BOOKING_DEFAULT_FIELDS = (
+    "id", "start_time", "end_time", "status",
+    "dog_name", "playground_id", "park_name", "address",
+)
+
+DOG_FIELDS = {
+    "id": "d.id",
+    "name": "d.name",
+    "breed": "d.breed",
+    "user_id": "d.user_id",
+    "category_code": "bc.code",
+}
+DOG_DEFAULT_FIELDS = ("id", "name", "category_code")
+
+
+def _select_list(field_sql, fields, keyset):
+    names = list(dict.fromkeys(list(keyset) + list(fields)))
+    return ", ".join(f"{field_sql[name]} AS {name}" for name in names)
+
+
+def user_bookings_query(user_id, fields, when=None, after=None, limit=50):
+    """
+    Keyset page of a user's bookings. `when` is 'upcoming' (nearest first)
+    or 'past'/None (latest first); `after` is the (start_time, id) of the
+    last row of the previous page. Fetches limit + 1 rows.
+    """
+    ascending = when == "upcoming"
+    query = f"SELECT {_select_list(BOOKING_FIELDS, fields, ('id', 'start_time'))}"
+    query += " FROM bookings b JOIN dogs d ON b.dog_id = d.id"
+    if "park_name" in fields or "address" in fields:
+        query += " JOIN playgrounds p ON b.playground_id = p.id"
+    query += " WHERE d.user_id = %s"
+    params = [user_id]
+    if when == "upcoming":
+        query += " AND b.start_time >= NOW()"
+    elif when == "past":
+        query += " AND b.start_time < NOW()"
+    if after:
+        op = ">" if ascending else "<"
+        query += f" AND (b.start_time {op} %s OR (b.start_time = %s AND b.id {op} %s))"
+        params += [after[0], after[0], after[1]]
+    direction = "ASC" if ascending else "DESC"
+    query += f" ORDER BY b.start_time {direction}, b.id {direction} LIMIT %s"
+    params.append(limit + 1)
+    return query, params
+
+
+def dogs_query(fields, after=None, limit=50):
+    """Keyset page of all dogs ordered by (name, id)."""
+    query = f"SELECT {_select_list(DOG_FIELDS, fields, ('id', 'name'))}"
+    query += " FROM dogs d"
+    if "category_code" in fields:
+        query += " JOIN breed_categories bc ON d.category_id = bc.id"
+    params = []
+    if after:
+        query += " WHERE (d.name > %s OR (d.name = %s AND d.id > %s))"
+        params += [after[0], after[0], after[1]]
+    query += " ORDER BY d.name, d.id LIMIT %s"
+    params.append(limit + 1)
+    return query, params
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .config import LOGIN_RATE_IP, LOGIN_RATE_USERNAME, LOGIN_RATE_WINDOW
+
+
+class RateLimiter:
+    """
+    Fixed-window attempt counter per key. Keys are kept in LRU order and the
+    table is bounded, so a flood of distinct usernames cannot grow memory.
+    """
+
+    def __init__(self, limit, window, max_keys=100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def hit(self, key):
+        """
+        Counts an attempt. Returns 0 when it is allowed, otherwise the number
+        of seconds until the window resets.
+        """
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._windows.get(key, (now, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            if count >= self.limit:
+                self.rejected += 1
+                return max(1, int(started + self.window - now + 0.999))
+            self._windows[key] = (started, count + 1)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._windows.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._windows), "rejected": self.rejected}
+
+
+# Попытки входа на одно имя пользователя и с одного адреса
+username_limiter = RateLimiter(LOGIN_RATE_USERNAME, LOGIN_RATE_WINDOW)
+ip_limiter = RateLimiter(LOGIN_RATE_IP, LOGIN_RATE_WINDOW)
+
+
+def check_login_attempt(username, ip):
+    """Seconds to wait before retrying, or 0 if the attempt may proceed."""
+    wait = ip_limiter.hit(ip)
+    if not wait and username is not None:
+        wait = username_limiter.hit(username.lower())
+    return wait
+
+
+def login_succeeded(username):
+    username_limiter.reset(username.lower())
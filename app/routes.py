@@ -1,12 +1,81 @@
-from datetime import date, datetime, timedelta
+import json
+from datetime import date, datetime, time, timedelta
 
 import mysql.connector
-from flask import Blueprint, jsonify, render_template, request, session
-from werkzeug.security import check_password_hash, generate_password_hash
-
-from .config import CATEGORY_LABELS, DB_CONFIG, SLOT_HOURS
-from .db import get_db
-from .services import build_slot_statuses, parse_photo_url, evaluate_slot, clean_park_name
+from flask import Blueprint, Response, jsonify, render_template, request, session
+
+from . import amenities, analytics, health, occupancy, search
+from .cache import cached_response, catalogue_cache
+from .categories import category_code, category_id, dog_category, forget_dog
+from .clusters import get_cluster_tree
+from .config import (
+    ANALYTICS_CACHE_TTL,
+    ANALYTICS_DEFAULT_MONTHS,
+    ANALYTICS_TOP_MAX,
+    AVAILABILITY_DEFAULT_DAYS,
+    AVAILABILITY_MAX_DAYS,
+    BOOKING_BATCH_MAX_SLOTS,
+    CATEGORY_LABELS,
+    EVENTS_HEARTBEAT,
+    FREE_SLOTS_MAX_CANDIDATES,
+    FREE_SLOTS_MAX_RADIUS,
+    PAGE_DEFAULT_LIMIT,
+    SEARCH_MAX_RESULTS,
+    SLOT_HOURS,
+)
+from .db import close_db, get_db, get_pool
+from .events import (
+    close_stream,
+    open_stream,
+    publish_slot,
+    streaming_unavailable,
+    subscribe_slots,
+)
+from .formats import encode_points, negotiate_points_format
+from .normalize import normalize_district
+from .pagination import (
+    PageError,
+    decode_cursor,
+    encode_cursor,
+    paginated,
+    parse_fields,
+    parse_limit,
+)
+from .passwords import HashingBusy, hash_password, needs_rehash, verify_password
+from .queries import (
+    BOOKING_DEFAULT_FIELDS,
+    BOOKING_FIELDS,
+    DISTRICTS_SQL,
+    DOG_DEFAULT_FIELDS,
+    DOG_FIELDS,
+    PLAYGROUND_DETAILS_SQL,
+    dogs_query,
+    user_bookings_query,
+)
+from .ratelimit import check_login_attempt, login_succeeded
+from .services import (
+    STATUS_CODES,
+    BookingError,
+    build_availability,
+    build_slot_statuses,
+    create_booking,
+    create_bookings,
+    evaluate_slot,
+    expand_recurrence,
+    find_free_slots,
+    slot_is_full,
+    slot_status,
+)
+from .sessions import cached_user_part, invalidate_user, regenerate
+from .spatial import (
+    get_index,
+    parse_bbox,
+    parse_index_query,
+    parse_point,
+    parse_radius,
+    points_for_ids,
+    query_points,
+)
 
 bp = Blueprint("main", __name__)
 
@@ -25,131 +94,143 @@ def map_view():
 def profile_view():
     return render_template("profile.html")
 
+def points_response(rows):
+    """Map points as plain JSON or in the compact format the client asked for."""
+    body, mimetype = encode_points(
+        rows, negotiate_points_format(request.args, request.accept_mimetypes)
+    )
+    if body is None:
+        return jsonify(rows)
+    return Response(body, mimetype=mimetype)
+
+
 @bp.route("/api/playgrounds")
+@cached_response(catalogue_cache, vary=("Accept",))
 def get_playgrounds():
-    district = request.args.get("district")
-    if district:
-        district = district.strip()
-    
-    # Получаем фильтры
-    lighting = request.args.get("lighting")
-    fencing = request.args.get("fencing")
-    elements = request.args.get("elements")
-    
+    district = normalize_district(request.args.get("district"))
+    filters = amenities.filters_from_args(request.args, district)
+
+    bbox = request.args.get("bbox")
+    near = request.args.get("near")
+    if bbox or near:
+        return query_playgrounds_index(filters, bbox, near)
+
     try:
-        with get_db() as conn:
-            with conn.cursor(dictionary=True) as cur:
-                if district:
-                    query = """
-                        SELECT id,
-                               CAST(lat AS DOUBLE) AS lat,
-                               CAST(lon AS DOUBLE) AS lon
-                        FROM playgrounds
-                        WHERE lat IS NOT NULL AND lon IS NOT NULL
-                          AND TRIM(district) = %s
-                    """
-                    params = [district]
-                    
-                    # Добавляем фильтры
-                    if lighting:
-                        query += " AND lighting = 'да'"
-                    if fencing:
-                        query += " AND fencing = 'да'"
-                    if elements:
-                        query += " AND elements IS NOT NULL AND elements <> '' AND elements <> '[]'"
-                    
-                    cur.execute(query, params)
-                else:
-                    query = """
-                        SELECT id,
-                               CAST(lat AS DOUBLE) AS lat,
-                               CAST(lon AS DOUBLE) AS lon
-                        FROM playgrounds
-                        WHERE lat IS NOT NULL AND lon IS NOT NULL
-                    """
-                    params = []
-                    
-                    # Добавляем фильтры
-                    if lighting:
-                        query += " AND lighting = 'да'"
-                    if fencing:
-                        query += " AND fencing = 'да'"
-                    if elements:
-                        query += " AND elements IS NOT NULL AND elements <> '' AND elements <> '[]'"
-                    
-                    cur.execute(query, params)
-                rows = cur.fetchall()
-        return jsonify(rows)
+        ids = amenities.get_index().ordered(**filters)
+        return points_response(points_for_ids(get_index(), ids))
+    except mysql.connector.Error as exc:
+        return jsonify({"error": "Database error", "details": str(exc)}), 500
+
+
+def query_playgrounds_index(filters, bbox, near):
+    try:
+        query = parse_index_query(
+            bbox, near, request.args.get("radius"), request.args.get("limit")
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid bbox, near or radius"}), 400
+
+    try:
+        index = get_index()
+        allowed = amenities.get_index().matching(**filters)
+    except mysql.connector.Error as exc:
+        return jsonify({"error": "Database error", "details": str(exc)}), 500
+
+    return points_response(query_points(index, allowed, **query))
+
+
+@bp.route("/api/playgrounds/amenities")
+@cached_response(catalogue_cache)
+def get_amenities():
+    """Element types usable in ?element=, with playground counts."""
+    try:
+        index = amenities.get_index()
+    except mysql.connector.Error as exc:
+        return jsonify({"error": "Database error", "details": str(exc)}), 500
+    return jsonify(
+        {
+            "flags": {
+                name: amenities.popcount(index.flags[name]) for name in amenities.FLAGS
+            },
+            "element_types": index.element_counts(),
+        }
+    )
+
+
+@bp.route("/api/playgrounds/clusters")
+@cached_response(catalogue_cache)
+def get_playground_clusters():
+    district = normalize_district(request.args.get("district"))
+    try:
+        zoom = int(request.args.get("zoom", ""))
+        bbox = request.args.get("bbox")
+        bbox = parse_bbox(bbox) if bbox else None
+    except ValueError:
+        return jsonify({"error": "Invalid zoom or bbox"}), 400
+
+    try:
+        tree = get_cluster_tree(amenities.filters_from_args(request.args, district))
     except mysql.connector.Error as exc:
         return jsonify({"error": "Database error", "details": str(exc)}), 500
+    return jsonify(tree.query(zoom, bbox))
 
 
 @bp.route("/api/playgrounds/search")
+@cached_response(catalogue_cache)
 def search_playgrounds():
-    district = request.args.get("district")
-    if not district:
-        return jsonify({"error": "District is required"}), 400
-    district = district.strip()
-    
-    # Получаем фильтры
-    lighting = request.args.get("lighting")
-    fencing = request.args.get("fencing")
-    elements = request.args.get("elements")
-    
+    district = normalize_district(request.args.get("district"))
+    text_query = (request.args.get("q") or "").strip()
+    if not district and not text_query:
+        return jsonify({"error": "District or query is required"}), 400
+    filters = amenities.filters_from_args(request.args, district)
+
     try:
-        with get_db() as conn:
-            with conn.cursor(dictionary=True) as cur:
-                query = """
-                    SELECT id, park_name, address, district, lighting, fencing, elements,
-                           CAST(lat AS DOUBLE) AS lat,
-                           CAST(lon AS DOUBLE) AS lon
-                    FROM playgrounds
-                    WHERE TRIM(district) = %s
-                """
-                params = [district]
-                
-                # Добавляем фильтры
-                if lighting:
-                    query += " AND lighting = 'да'"
-                if fencing:
-                    query += " AND fencing = 'да'"
-                if elements:
-                    query += " AND elements IS NOT NULL AND elements <> '' AND elements <> '[]'"
-                
-                query += " ORDER BY id"
-                
-                cur.execute(query, params)
-                rows = cur.fetchall()
-        
-        for row in rows:
-            row["park_name"] = clean_park_name(row["park_name"])
+        if text_query:
+            try:
+                limit = min(int(request.args.get("limit") or SEARCH_MAX_RESULTS),
+                            SEARCH_MAX_RESULTS)
+            except ValueError:
+                return jsonify({"error": "Invalid limit"}), 400
+            rows = search.get_index().search(
+                text_query,
+                limit=limit,
+                allowed=amenities.get_index().matching(**filters),
+            )
+            return jsonify(rows)
 
+        rows = search.get_index().rows(amenities.get_index().ordered(**filters))
         return jsonify(rows)
     except mysql.connector.Error as exc:
         return jsonify({"error": "Database error", "details": str(exc)}), 500
 
 
 @bp.route("/api/districts")
+@cached_response(catalogue_cache)
 def get_districts():
     try:
         with get_db() as conn:
             with conn.cursor(dictionary=True) as cur:
-                cur.execute(
-                    """
-                    SELECT DISTINCT TRIM(district) AS district
-                    FROM playgrounds
-                    WHERE district IS NOT NULL AND TRIM(district) <> ''
-                    ORDER BY district
-                    """
-                )
+                cur.execute(DISTRICTS_SQL)
                 rows = cur.fetchall()
         return jsonify([row["district"] for row in rows])
     except mysql.connector.Error as exc:
         return jsonify({"error": "Database error", "details": str(exc)}), 500
 
 
-@bp.route("/api/playgrounds/<int:playground_id>/details")
-def get_playground_details(playground_id):
+def too_many_attempts(wait):
+    response = jsonify({"error": "Too many attempts, try again later"})
+    response.headers["Retry-After"] = str(wait)
+    return response, 429
+
+
+def hashing_busy():
+    response = jsonify({"error": "Server is busy, try again later"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def resolve_requested_category():
+    """Category from ?dog_id= (the dog's category) or ?category=, default STANDARD."""
     requested_category = request.args.get("category", "STANDARD").upper()
     dog_id = request.args.get("dog_id")
     if dog_id:
@@ -158,34 +239,19 @@ def get_playground_details(playground_id):
         except ValueError:
             dog_id = None
     if dog_id:
-        with get_db() as conn:
-            with conn.cursor(dictionary=True) as cur:
-                cur.execute(
-                    """
-                    SELECT bc.code AS category_code
-                    FROM dogs d
-                    JOIN breed_categories bc ON d.category_id = bc.id
-                    WHERE d.id = %s
-                    """,
-                    (dog_id,),
-                )
-                dog_row = cur.fetchone()
-        if dog_row and dog_row.get("category_code"):
-            requested_category = dog_row["category_code"]
+        requested_category = dog_category(dog_id) or requested_category
     if requested_category not in CATEGORY_LABELS:
         requested_category = "STANDARD"
+    return requested_category
+
+
+@bp.route("/api/playgrounds/<int:playground_id>/details")
+def get_playground_details(playground_id):
+    requested_category = resolve_requested_category()
 
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
-            cur.execute(
-                """
-                SELECT id, adm_area, district, address, park_name, area, elements,
-                       lighting, fencing, working_hours, photo_id, lat, lon
-                FROM playgrounds
-                WHERE id = %s
-                """,
-                (playground_id,),
-            )
+            cur.execute(PLAYGROUND_DETAILS_SQL, (playground_id,))
             row = cur.fetchone()
 
     if not row:
@@ -193,13 +259,144 @@ def get_playground_details(playground_id):
 
     today = date.today()
     slots = build_slot_statuses(playground_id, today, requested_category)
-    row["photo_url"] = parse_photo_url(row.get("photo_id"))
-    row["park_name"] = clean_park_name(row.get("park_name"))
+    row["elements_list"] = json.loads(row["elements_list"] or "[]")
     row["requested_category"] = requested_category
     row["slots"] = slots
     return jsonify(row)
 
 
+@bp.route("/api/playgrounds/<int:playground_id>/availability")
+def get_playground_availability(playground_id):
+    try:
+        start_date = date.fromisoformat(request.args.get("from") or date.today().isoformat())
+        end_raw = request.args.get("to")
+        if end_raw:
+            end_date = date.fromisoformat(end_raw)
+        else:
+            end_date = start_date + timedelta(days=AVAILABILITY_DEFAULT_DAYS - 1)
+    except ValueError:
+        return jsonify({"error": "Invalid date range"}), 400
+    if end_date < start_date:
+        return jsonify({"error": "Invalid date range"}), 400
+    if (end_date - start_date).days >= AVAILABILITY_MAX_DAYS:
+        return (
+            jsonify({"error": f"Range is limited to {AVAILABILITY_MAX_DAYS} days"}),
+            400,
+        )
+
+    requested_category = resolve_requested_category()
+    try:
+        days = build_availability(playground_id, start_date, end_date, requested_category)
+    except mysql.connector.Error as exc:
+        return jsonify({"error": "Database error", "details": str(exc)}), 500
+    return jsonify(
+        {
+            "playground_id": playground_id,
+            "requested_category": requested_category,
+            "from": start_date.isoformat(),
+            "to": end_date.isoformat(),
+            "hours": SLOT_HOURS,
+            "status_codes": {code: status for status, code in STATUS_CODES.items()},
+            "days": days,
+        }
+    )
+
+
+@bp.route("/api/playgrounds/free-slots")
+def search_free_slots():
+    try:
+        lat, lon = parse_point(request.args.get("near", ""))
+        radius = parse_radius(request.args.get("radius"), 5000.0, FREE_SLOTS_MAX_RADIUS)
+        slot_date = date.fromisoformat(request.args.get("date") or date.today().isoformat())
+        from_hour = int(request.args.get("from_hour", SLOT_HOURS[0]))
+        to_hour = int(request.args.get("to_hour", SLOT_HOURS[-1]))
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "Invalid near, radius, date, hours or limit"}), 400
+    hours = [hour for hour in SLOT_HOURS if from_hour <= hour <= to_hour]
+    if not hours or limit <= 0:
+        return jsonify({"error": "Invalid near, radius, date, hours or limit"}), 400
+
+    try:
+        requested_category = resolve_requested_category()
+        allowed = amenities.get_index().matching(
+            **amenities.filters_from_args(request.args)
+        )
+        candidates = [
+            (distance, point)
+            for distance, point in get_index().query_radius(lat, lon, radius)
+            if allowed is None or point["id"] in allowed
+        ][:FREE_SLOTS_MAX_CANDIDATES]
+        results = find_free_slots(
+            candidates, slot_date, hours, requested_category, min(limit, 100)
+        )
+    except mysql.connector.Error as exc:
+        return jsonify({"error": "Database error", "details": str(exc)}), 500
+    return jsonify(
+        {
+            "requested_category": requested_category,
+            "date": slot_date.isoformat(),
+            "playgrounds": results,
+        }
+    )
+
+
+@bp.route("/api/playgrounds/<int:playground_id>/events")
+def playground_events(playground_id):
+    """
+    Server-Sent Events stream of slot changes for one playground and date,
+    with statuses evaluated for the subscriber's category. Needs a threaded
+    or async server and, with several worker processes, EVENTS_BACKEND=redis
+    (see streaming_unavailable); otherwise answers 503 and the page works
+    without live updates.
+    """
+    try:
+        slot_date = date.fromisoformat(request.args.get("date") or date.today().isoformat())
+    except ValueError:
+        return jsonify({"error": "Invalid date"}), 400
+    reason = streaming_unavailable(request.environ)
+    if reason:
+        return jsonify({"error": reason}), 503
+    requested_category = resolve_requested_category()
+    # Соединение с БД больше не нужно, не держим его на время подписки
+    close_db()
+    if not open_stream():
+        return jsonify({"error": "Too many live update streams"}), 503
+    subscription = subscribe_slots(playground_id, slot_date)
+    if subscription is None:
+        close_stream()
+        return jsonify({"error": "Live updates are unavailable"}), 503
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                message = subscription.get(timeout=EVENTS_HEARTBEAT)
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                categories = message["categories"]
+                allowed, limit = evaluate_slot(categories, requested_category)
+                count = len(categories)
+                payload = {
+                    "date": message["date"],
+                    "hour": message["hour"],
+                    "status": slot_status(count, allowed, limit),
+                    "count": count,
+                    "limit": limit,
+                    "categories": categories,
+                }
+                yield f"event: slot\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        finally:
+            subscription.close()
+
+    response = Response(stream(), mimetype="text/event-stream")
+    response.call_on_close(close_stream)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @bp.route("/api/book", methods=["POST"])
 def book_slot():
     payload = request.get_json(silent=True) or {}
@@ -217,102 +414,160 @@ def book_slot():
     if slot_hour not in SLOT_HOURS:
         return jsonify({"error": "Invalid slot hour"}), 400
 
-    with get_db() as conn:
-        with conn.cursor(dictionary=True) as cur:
-
-            cur.execute(
-                """
-                SELECT id FROM bookings
-                WHERE dog_id = %s
-                  AND DATE(start_time) = %s
-                  AND HOUR(start_time) = %s
-                  AND status = 'confirmed'
-                LIMIT 1
-                """,
-                (dog_id, slot_date, slot_hour),
-            )
-            if cur.fetchone():
-                return jsonify({"error": "Собака уже записана на это время."}), 409
-
-            cur.execute(
-                """
-                SELECT bc.code AS category_code
-                FROM dogs d
-                JOIN breed_categories bc ON d.category_id = bc.id
-                WHERE d.id = %s
-                """,
-                (dog_id,),
-            )
-            dog_row = cur.fetchone()
-    if not dog_row:
-        return jsonify({"error": "Dog not found"}), 404
-    category_code = dog_row["category_code"]
-
     try:
         start_time = datetime.fromisoformat(slot_date).replace(
             hour=slot_hour, minute=0, second=0, microsecond=0
         )
     except ValueError:
         return jsonify({"error": "Invalid slot date"}), 400
-    end_time = start_time + timedelta(hours=1)
+
+    try:
+        booking_id, owner_id = create_booking(playground_id, dog_id, start_time)
+    except BookingError as exc:
+        return jsonify({"error": exc.message}), exc.status
+    invalidate_user(owner_id, "bookings")
+
+    return jsonify({"success": True, "booking_id": booking_id})
+
+
+def parse_batch_start_times(payload):
+    """
+    Start times from `slots` ([{slot_date, slot_hour}]) or from `repeat`
+    ({start_date, end_date, slot_hour, weekdays}). Raises ValueError.
+    """
+    slots = payload.get("slots")
+    repeat = payload.get("repeat")
+    if slots is not None:
+        if not isinstance(slots, list):
+            raise ValueError("slots must be a list")
+        pairs = [(slot.get("slot_date"), slot.get("slot_hour")) for slot in slots]
+    elif isinstance(repeat, dict):
+        start_date = date.fromisoformat(repeat.get("start_date") or "")
+        end_date = date.fromisoformat(repeat.get("end_date") or "")
+        if end_date < start_date:
+            raise ValueError("end_date is before start_date")
+        if (end_date - start_date).days >= BOOKING_BATCH_MAX_SLOTS * 7:
+            raise ValueError("Date range is too long")
+        weekdays = {int(day) for day in repeat.get("weekdays") or ()}
+        if not weekdays <= set(range(1, 8)):
+            raise ValueError("weekdays must be 1 (Monday) .. 7 (Sunday)")
+        hour = int(repeat.get("slot_hour"))
+        if hour not in SLOT_HOURS:
+            raise ValueError("Invalid slot hour")
+        return expand_recurrence(start_date, end_date, hour, weekdays)
+    else:
+        raise ValueError("Pass slots or repeat")
+
+    start_times = []
+    for slot_date, slot_hour in pairs:
+        hour = int(slot_hour)
+        if hour not in SLOT_HOURS:
+            raise ValueError("Invalid slot hour")
+        start_times.append(datetime.combine(date.fromisoformat(slot_date), time(hour)))
+    return start_times
+
+
+@bp.route("/api/book/batch", methods=["POST"])
+def book_slots_batch():
+    payload = request.get_json(silent=True) or {}
+    try:
+        playground_id = int(payload.get("playground_id"))
+        dog_id = int(payload.get("dog_id"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid playground or dog"}), 400
+    try:
+        start_times = parse_batch_start_times(payload)
+    except (TypeError, ValueError, AttributeError) as exc:
+        return jsonify({"error": f"Invalid slots: {exc}"}), 400
+    if not start_times:
+        return jsonify({"error": "No slots to book"}), 400
+    if len(set(start_times)) > BOOKING_BATCH_MAX_SLOTS:
+        return jsonify({"error": f"At most {BOOKING_BATCH_MAX_SLOTS} slots per request"}), 400
+
+    try:
+        results, owner_id = create_bookings(playground_id, dog_id, start_times)
+    except BookingError as exc:
+        return jsonify({"error": exc.message}), exc.status
+    invalidate_user(owner_id, "bookings")
+
+    accepted = sum(result["status"] == "accepted" for result in results)
+    return jsonify({
+        "success": accepted > 0,
+        "accepted": accepted,
+        "conflicts": len(results) - accepted,
+        "results": results,
+    })
+
+
+@bp.route("/api/bookings/<int:booking_id>/cancel", methods=["POST"])
+def cancel_booking(booking_id):
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Not authorized"}), 401
 
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
             cur.execute(
                 """
-                SELECT bc.code AS category_code
+                SELECT b.playground_id, b.start_time, b.status, d.user_id,
+                       d.category_id
                 FROM bookings b
                 JOIN dogs d ON b.dog_id = d.id
-                JOIN breed_categories bc ON d.category_id = bc.id
-                WHERE b.playground_id = %s
-                  AND DATE(b.start_time) = %s
-                  AND HOUR(b.start_time) = %s
-                  AND b.status = 'confirmed'
+                WHERE b.id = %s
+                FOR UPDATE OF b
                 """,
-                (playground_id, slot_date, slot_hour),
+                (booking_id,),
             )
-            existing = [row["category_code"] for row in cur.fetchall()]
-
-            allowed, limit = evaluate_slot(existing, category_code)
-            if not allowed or len(existing) >= limit:
-                return (
-                    jsonify({"error": "Slot is not available for this category"}),
-                    409,
-                )
+            row = cur.fetchone()
+            if not row or row["user_id"] != user_id:
+                return jsonify({"error": "Booking not found"}), 404
+            if row["status"] != "confirmed":
+                return jsonify({"error": "Booking is not active"}), 409
 
             cur.execute(
-                """
-                INSERT INTO bookings (playground_id, dog_id, start_time, end_time, status)
-                VALUES (%s, %s, %s, %s, 'confirmed')
-                """,
-                (playground_id, dog_id, start_time, end_time),
+                "UPDATE bookings SET status = 'cancelled' WHERE id = %s",
+                (booking_id,),
+            )
+            slot_date = row["start_time"].date()
+            slot_hour = row["start_time"].hour
+            code = category_code(row["category_id"])
+            occupancy.adjust(cur, row["playground_id"], slot_date, slot_hour, code, -1)
+            categories = occupancy.fetch_slot(
+                cur, row["playground_id"], slot_date, slot_hour
+            )
+            analytics.record(
+                cur,
+                row["playground_id"],
+                row["start_time"],
+                code,
+                -1,
+                int(slot_is_full(categories)) - int(slot_is_full(categories + [code])),
             )
         conn.commit()
 
+    publish_slot(row["playground_id"], slot_date, slot_hour, categories)
+    invalidate_user(user_id, "bookings")
+
     return jsonify({"success": True})
 
 
 @bp.route("/api/dogs")
 def get_dogs():
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        fields = parse_fields(request.args.get("fields"), DOG_FIELDS, DOG_DEFAULT_FIELDS)
+        after = request.args.get("after")
+        after = decode_cursor(after, (str, int)) if after else None
+    except PageError as exc:
+        return jsonify({"error": str(exc)}), 400
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
-            cur.execute(
-                """
-                SELECT d.id, d.name, bc.code AS category_code
-                FROM dogs d
-                JOIN breed_categories bc ON d.category_id = bc.id
-                ORDER BY d.name
-                """
-            )
+            cur.execute(*dogs_query(fields, after, limit))
             rows = cur.fetchall()
-    return jsonify(rows)
+    return paginated(rows, limit, lambda row: (row["name"], row["id"]), fields)
 
 
-@bp.route("/api/me")
-def get_me():
-    user_id = session.get("user_id")
-    if not user_id:
-        return jsonify({"error": "Not authorized"}), 401
+def load_profile(user_id):
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
             cur.execute(
@@ -323,31 +578,87 @@ def get_me():
                 """,
                 (user_id,),
             )
-            user_row = cur.fetchone()
-    if not user_row:
-        return jsonify({"error": "User not found"}), 404
-    return jsonify(user_row)
+            return cur.fetchone()
 
 
-@bp.route("/api/my-dogs")
-def get_my_dogs():
-    user_id = session.get("user_id")
-    if not user_id:
-        return jsonify({"error": "Not authorized"}), 401
+def load_dogs(user_id):
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
             cur.execute(
                 """
-                SELECT d.id, d.name, d.breed, bc.code AS category_code
+                SELECT d.id, d.name, d.breed, d.category_id
                 FROM dogs d
-                JOIN breed_categories bc ON d.category_id = bc.id
                 WHERE d.user_id = %s
                 ORDER BY d.name
                 """,
                 (user_id,),
             )
             rows = cur.fetchall()
-    return jsonify(rows)
+    return [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "breed": row["breed"],
+            "category_code": category_code(row["category_id"]),
+        }
+        for row in rows
+    ]
+
+
+def load_first_bookings(user_id):
+    """First page of /api/my-bookings with default fields, and its next cursor."""
+    limit = PAGE_DEFAULT_LIMIT
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(
+                *user_bookings_query(user_id, BOOKING_DEFAULT_FIELDS, None, None, limit)
+            )
+            rows = cur.fetchall()
+    page = rows[:limit]
+    return {
+        "items": [{field: row[field] for field in BOOKING_DEFAULT_FIELDS} for row in page],
+        "next": (
+            encode_cursor((page[-1]["start_time"], page[-1]["id"]))
+            if len(rows) > limit
+            else None
+        ),
+    }
+
+
+USER_INCLUDES = {"dogs": load_dogs, "bookings": load_first_bookings}
+
+
+@bp.route("/api/me")
+def get_me():
+    """Profile; ?include=dogs,bookings adds those so a page loads in one call."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Not authorized"}), 401
+    includes = [part for part in (request.args.get("include") or "").split(",") if part]
+    unknown = [part for part in includes if part not in USER_INCLUDES]
+    if unknown:
+        return jsonify({"error": f"Unknown include: {unknown[0]}"}), 400
+
+    user_row = cached_user_part(user_id, "profile", lambda: load_profile(user_id))
+    if not user_row:
+        return jsonify({"error": "User not found"}), 404
+    result = dict(user_row)
+    for part in includes:
+        value = cached_user_part(user_id, part, lambda: USER_INCLUDES[part](user_id))
+        if part == "bookings":
+            result["bookings"] = value["items"]
+            result["bookings_next_cursor"] = value["next"]
+        else:
+            result[part] = value
+    return jsonify(result)
+
+
+@bp.route("/api/my-dogs")
+def get_my_dogs():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Not authorized"}), 401
+    return jsonify(cached_user_part(user_id, "dogs", lambda: load_dogs(user_id)))
 
 
 @bp.route("/api/my-bookings")
@@ -355,28 +666,24 @@ def get_my_bookings():
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"error": "Not authorized"}), 401
+    when = request.args.get("when")
+    if when not in (None, "", "upcoming", "past"):
+        return jsonify({"error": "when must be upcoming or past"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        fields = parse_fields(
+            request.args.get("fields"), BOOKING_FIELDS, BOOKING_DEFAULT_FIELDS
+        )
+        after = request.args.get("after")
+        after = decode_cursor(after, (datetime, int)) if after else None
+    except PageError as exc:
+        return jsonify({"error": str(exc)}), 400
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
-            cur.execute(
-                """
-                SELECT b.id, b.start_time, b.end_time, b.status,
-                       d.name AS dog_name,
-                       p.id AS playground_id,
-                       p.park_name, p.address
-                FROM bookings b
-                JOIN dogs d ON b.dog_id = d.id
-                JOIN playgrounds p ON b.playground_id = p.id
-                WHERE d.user_id = %s
-                ORDER BY b.start_time DESC
-                """,
-                (user_id,),
-            )
+            cur.execute(*user_bookings_query(user_id, fields, when or None, after, limit))
             rows = cur.fetchall()
 
-    for row in rows:
-        row["park_name"] = clean_park_name(row["park_name"])
-
-    return jsonify(rows)
+    return paginated(rows, limit, lambda row: (row["start_time"], row["id"]), fields)
 
 
 @bp.route("/api/dogs/add", methods=["POST"])
@@ -394,24 +701,23 @@ def add_dog():
     if dog_category not in CATEGORY_LABELS:
         return jsonify({"error": "Invalid dog category"}), 400
 
+    dog_category_id = category_id(dog_category)
+    if dog_category_id is None:
+        return jsonify({"error": "Dog category not found"}), 400
+
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
-            cur.execute(
-                "SELECT id FROM breed_categories WHERE code = %s",
-                (dog_category,),
-            )
-            category_row = cur.fetchone()
-            if not category_row:
-                return jsonify({"error": "Dog category not found"}), 400
-
             cur.execute(
                 """
                 INSERT INTO dogs (user_id, category_id, name, breed)
                 VALUES (%s, %s, %s, %s)
                 """,
-                (user_id, category_row["id"], dog_name, dog_breed),
+                (user_id, dog_category_id, dog_name, dog_breed),
             )
+            dog_id = cur.lastrowid
         conn.commit()
+    forget_dog(dog_id)
+    invalidate_user(user_id, "dogs")
 
     return jsonify({"success": True})
 
@@ -430,6 +736,17 @@ def register_user():
         return jsonify({"error": "Missing required fields"}), 400
     if dog_category not in CATEGORY_LABELS:
         return jsonify({"error": "Invalid dog category"}), 400
+    dog_category_id = category_id(dog_category)
+    if dog_category_id is None:
+        return jsonify({"error": "Dog category not found"}), 400
+    wait = check_login_attempt(None, request.remote_addr)
+    if wait:
+        return too_many_attempts(wait)
+    # Хэшируем до get_db(), чтобы не держать соединение пула на время хэша
+    try:
+        password_hash = hash_password(password)
+    except HashingBusy:
+        return hashing_busy()
 
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
@@ -447,15 +764,6 @@ def register_user():
             if cur.fetchone():
                 return jsonify({"error": "Username already exists"}), 409
 
-            cur.execute(
-                "SELECT id FROM breed_categories WHERE code = %s",
-                (dog_category,),
-            )
-            category_row = cur.fetchone()
-            if not category_row:
-                return jsonify({"error": "Dog category not found"}), 400
-
-            password_hash = generate_password_hash(password)
             cur.execute(
                 """
                 INSERT INTO users (username, email, password_hash)
@@ -469,16 +777,18 @@ def register_user():
                 INSERT INTO dogs (user_id, category_id, name, breed)
                 VALUES (%s, %s, %s, %s)
                 """,
-                (user_id, category_row["id"], dog_name, dog_breed),
+                (user_id, dog_category_id, dog_name, dog_breed),
             )
+            dog_id = cur.lastrowid
         conn.commit()
+    forget_dog(dog_id)
 
     return jsonify({"success": True})
 
 
 @bp.route("/api/logout", methods=["POST"])
 def logout_user():
-    session.pop("user_id", None)
+    session.clear()
     return jsonify({"success": True})
 
 
@@ -490,6 +800,9 @@ def login_user():
 
     if not username or not password:
         return jsonify({"error": "Missing credentials"}), 400
+    wait = check_login_attempt(username, request.remote_addr)
+    if wait:
+        return too_many_attempts(wait)
 
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
@@ -503,58 +816,125 @@ def login_user():
             )
             user_row = cur.fetchone()
 
-    if not user_row or not check_password_hash(
-        user_row["password_hash"], password
-    ):
+    try:
+        valid = user_row is not None and verify_password(
+            user_row["password_hash"], password
+        )
+    except HashingBusy:
+        return hashing_busy()
+    if not valid:
         return jsonify({"error": "Invalid username or password"}), 401
 
+    login_succeeded(username)
+    if needs_rehash(user_row["password_hash"]):
+        rehash_password(user_row["id"], password)
+
+    regenerate(session)
     session["user_id"] = user_row["id"]
     return jsonify({"success": True, "user_id": user_row["id"], "username": user_row["username"]})
 
 
-@bp.route("/api/diagnostics")
-def diagnostics():
+def rehash_password(user_id, password):
+    """Re-hashes with the current PASSWORD_HASH_METHOD; skipped under load."""
+    try:
+        password_hash = hash_password(password)
+    except HashingBusy:
+        return
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE users SET password_hash = %s WHERE id = %s",
+                (password_hash, user_id),
+            )
+        conn.commit()
+
+
+def parse_month(raw):
+    return datetime.strptime(raw, "%Y-%m").date()
+
+
+def analytics_filters():
+    """Month range (?from=YYYY-MM&to=YYYY-MM) and district; raises ValueError."""
+    start_month, end_month = analytics.default_range(ANALYTICS_DEFAULT_MONTHS)
+    if request.args.get("from"):
+        start_month = parse_month(request.args["from"])
+    if request.args.get("to"):
+        end_month = parse_month(request.args["to"])
+    if end_month < start_month:
+        raise ValueError("to is before from")
+    district = normalize_district(request.args.get("district"))
+    return start_month, end_month, district
+
+
+@bp.route("/api/analytics/heatmap")
+@cached_response(analytics.analytics_cache, max_age=ANALYTICS_CACHE_TTL)
+def analytics_heatmap():
+    try:
+        start_month, end_month, district = analytics_filters()
+        playground_id = int(request.args.get("playground_id") or 0) or None
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    category = (request.args.get("category") or "").upper() or None
+    if category and category not in CATEGORY_LABELS:
+        return jsonify({"error": "Invalid category"}), 400
     try:
         with get_db() as conn:
             with conn.cursor(dictionary=True) as cur:
-                cur.execute("SELECT DATABASE() AS db")
-                db_row = cur.fetchone()
-                cur.execute(
-                    """
-                    SELECT table_name
-                    FROM information_schema.tables
-                    WHERE table_schema = %s
-                    """,
-                    (DB_CONFIG["database"],),
-                )
-                tables = [row["table_name"] for row in cur.fetchall()]
-                cur.execute("SELECT COUNT(*) AS total FROM playgrounds")
-                total_playgrounds = cur.fetchone()["total"]
-                cur.execute(
-                    """
-                    SELECT COUNT(DISTINCT TRIM(district)) AS total
-                    FROM playgrounds
-                    WHERE district IS NOT NULL AND TRIM(district) <> ''
-                    """
+                result = analytics.heatmap(
+                    cur, start_month, end_month, district, playground_id, category
                 )
-                total_districts = cur.fetchone()["total"]
-                cur.execute(
-                    """
-                    SELECT TRIM(district) AS district
-                    FROM playgrounds
-                    WHERE district IS NOT NULL AND TRIM(district) <> ''
-                    LIMIT 5
-                    """
+    except mysql.connector.Error as exc:
+        return jsonify({"error": "Database error", "details": str(exc)}), 500
+    return jsonify(result)
+
+
+@bp.route("/api/analytics/top")
+@cached_response(analytics.analytics_cache, max_age=ANALYTICS_CACHE_TTL)
+def analytics_top():
+    by = request.args.get("by", "playground")
+    metric = request.args.get("metric", "bookings")
+    if by not in analytics.TOP_DIMENSIONS and by != "category":
+        return jsonify({"error": "Invalid by"}), 400
+    if metric not in analytics.TOP_METRICS:
+        return jsonify({"error": "Invalid metric"}), 400
+    try:
+        start_month, end_month, district = analytics_filters()
+        limit = min(int(request.args.get("limit") or 10), ANALYTICS_TOP_MAX)
+        with get_db() as conn:
+            with conn.cursor(dictionary=True) as cur:
+                items = analytics.top(
+                    cur, by, metric, max(limit, 1), start_month, end_month, district
                 )
-                sample_districts = [row["district"] for row in cur.fetchall()]
-        return jsonify(
-            {
-                "db": db_row["db"],
-                "tables": tables,
-                "playgrounds_total": total_playgrounds,
-                "districts_total": total_districts,
-                "sample_districts": sample_districts,
-            }
-        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     except mysql.connector.Error as exc:
         return jsonify({"error": "Database error", "details": str(exc)}), 500
+    return jsonify({
+        "by": by,
+        "metric": metric,
+        "from": start_month.isoformat(),
+        "to": end_month.isoformat(),
+        "items": items,
+    })
+
+
+@bp.route("/healthz")
+def liveness():
+    """Liveness: the process answers; never touches the database."""
+    return jsonify({"status": "ok"})
+
+
+@bp.route("/readyz")
+def readiness():
+    ready, details = health.readiness()
+    return jsonify(details), 200 if ready else 503
+
+
+@bp.route("/api/diagnostics")
+def diagnostics():
+    return jsonify(health.diagnostics())
+
+
+@bp.route("/api/diagnostics/pool")
+def pool_diagnostics():
+    return jsonify(get_pool().stats())
@@ -0,0 +1,249 @@
+import heapq
+import re
+import threading
+import time
+from collections import Counter
+
+from .config import SEARCH_INDEX_TTL, SEARCH_MAX_RESULTS
+from .db import get_db
+from .indexes import SharedIndex
+
+# Поля документа и их вес при ранжировании
+FIELD_WEIGHTS = {"park_name": 3.0, "address": 2.0, "district": 1.0}
+
+# Триграммы, встречающиеся у большей доли площадок ("рай", "ули"),
+# не участвуют в отборе кандидатов, только в оценке
+COMMON_TRIGRAM_SHARE = 0.3
+
+# Сколько кандидатов на один результат проходит полную оценку
+RESCORE_FACTOR = 10
+
+# Доля триграмм запроса, которая должна совпасть у кандидата
+MIN_MATCH_SHARE = 0.4
+
+_non_word = re.compile(r"[^\w]+")
+
+DOCUMENTS_SQL = """
+    SELECT id, park_name_clean AS park_name, address,
+           district_norm AS district, lighting, fencing, elements,
+           CAST(lat AS DOUBLE) AS lat,
+           CAST(lon AS DOUBLE) AS lon
+    FROM playgrounds
+"""
+
+
+def normalize_text(text):
+    """Lowercase, ё -> е, punctuation to spaces."""
+    if not text:
+        return ""
+    text = text.lower().replace("ё", "е")
+    return " ".join(_non_word.sub(" ", text).replace("_", " ").split())
+
+
+def word_trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_trigrams(text):
+    grams = set()
+    for word in text.split():
+        grams |= word_trigrams(word)
+    return grams
+
+
+class SearchIndex:
+    """
+    Trigram inverted index over park name, address and district.
+
+    Words are padded ("  сок ") so that prefixes match the leading trigrams,
+    and a typo only costs the two or three trigrams around it.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.postings = {}
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _document(self, row):
+        fields = {name: normalize_text(row.get(name)) for name in FIELD_WEIGHTS}
+        return {
+            "row": {
+                "id": row["id"],
+                "park_name": row.get("park_name"),
+                "address": row.get("address"),
+                "district": row.get("district"),
+                "lighting": row.get("lighting"),
+                "fencing": row.get("fencing"),
+                "elements": row.get("elements"),
+                "lat": row.get("lat"),
+                "lon": row.get("lon"),
+            },
+            "fields": fields,
+            "grams": {name: text_trigrams(text) for name, text in fields.items()},
+            "size": len(fields["park_name"]),
+        }
+
+    def _unlink(self, playground_id):
+        document = self.documents.pop(playground_id, None)
+        if document is None:
+            return
+        for gram in set().union(*document["grams"].values()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(playground_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def upsert(self, rows):
+        """Adds or replaces documents; used after imports."""
+        with self._lock:
+            for row in rows:
+                self._unlink(row["id"])
+                document = self._document(row)
+                self.documents[row["id"]] = document
+                for gram in set().union(*document["grams"].values()):
+                    self.postings.setdefault(gram, set()).add(row["id"])
+
+    def _candidates(self, grams):
+        common = max(1, int(len(self.documents) * COMMON_TRIGRAM_SHARE))
+        selective = [gram for gram in grams if len(self.postings.get(gram, ())) <= common]
+        if not selective:
+            # Запрос только из частых триграмм: перебираем по ним всем
+            selective = grams
+        hits = Counter()
+        for gram in selective:
+            hits.update(self.postings.get(gram, ()))
+        needed = max(1, int(len(selective) * MIN_MATCH_SHARE))
+        return [
+            (count, playground_id) for playground_id, count in hits.items() if count >= needed
+        ]
+
+    @staticmethod
+    def _score(document, query_text, grams):
+        best = 0.0
+        for name, weight in FIELD_WEIGHTS.items():
+            field_grams = document["grams"][name]
+            if not field_grams:
+                continue
+            overlap = len(grams & field_grams)
+            if not overlap:
+                continue
+            # Доля триграмм запроса в поле, с поправкой на длину поля
+            score = overlap / len(grams) - 0.1 * (1 - overlap / len(field_grams))
+            # Точное вхождение (в том числе префикс слова) выше опечатки
+            if query_text in document["fields"][name]:
+                score += 0.5
+            best = max(best, score * weight)
+        return best
+
+    def rows(self, ids):
+        """Stored rows for `ids`, in that order."""
+        with self._lock:
+            return [
+                self.documents[playground_id]["row"]
+                for playground_id in ids
+                if playground_id in self.documents
+            ]
+
+    def search(self, query, limit=SEARCH_MAX_RESULTS, allowed=None):
+        """
+        Ranked rows for `query`; each row gets a `score`. `allowed` limits
+        results to a set of ids (district and amenity filters).
+        """
+        query_text = normalize_text(query)
+        if not query_text:
+            return []
+        grams = text_trigrams(query_text)
+        with self._lock:
+            matched = []
+            for hits, playground_id in self._candidates(grams):
+                if allowed is not None and playground_id not in allowed:
+                    continue
+                document = self.documents[playground_id]
+                matched.append((hits, -document["size"], playground_id, document))
+            # Полная оценка только для лучших по числу совпавших триграмм
+            scored = []
+            # (при равенстве выше площадка с более коротким названием)
+            for _, _, playground_id, document in heapq.nlargest(
+                max(limit * RESCORE_FACTOR, 100), matched, key=lambda item: item[:2]
+            ):
+                score = self._score(document, query_text, grams)
+                if score > 0:
+                    scored.append((score, playground_id, document))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            {**document["row"], "score": round(score, 3)}
+            for score, _, document in scored[:limit]
+        ]
+
+
+def load_documents():
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(DOCUMENTS_SQL)
+            return cur.fetchall()
+
+
+def build_index(rows=None):
+    index = SearchIndex()
+    index.upsert(load_documents() if rows is None else rows)
+    return index
+
+
+_shared = SharedIndex("Search index", build_index, SEARCH_INDEX_TTL)
+
+
+def get_index():
+    """
+    The shared index, built on first use. Past SEARCH_INDEX_TTL it keeps
+    serving while a fresh copy is built in the background, so imports run by
+    other processes (flask import-playgrounds) show up without a restart.
+    """
+    return _shared.get()
+
+
+def current_index():
+    return _shared.current()
+
+
+def install_index(index):
+    _shared.install(index)
+
+
+def update_documents(global_ids):
+    """
+    Re-reads imported playgrounds (by global_id) into the index if this
+    process has one; called by the importer after each committed batch.
+    """
+    index = _shared.current()
+    if index is None or not global_ids:
+        return
+    global_ids = list(global_ids)
+    rows = []
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            for start in range(0, len(global_ids), 1000):
+                chunk = global_ids[start:start + 1000]
+                cur.execute(
+                    DOCUMENTS_SQL
+                    + f" WHERE global_id IN ({', '.join(['%s'] * len(chunk))})",
+                    chunk,
+                )
+                rows.extend(cur.fetchall())
+    index.upsert(rows)
+
+
+def invalidate_index():
+    _shared.invalidate()
+
+
+def warm_up():
+    """before_request hook: starts building the index with the first request."""
+    if _shared.current() is None:
+        _shared.refresh_in_background()
+
+
+def init_app(app):
+    app.before_request(warm_up)
@@ -1,7 +1,26 @@
+import bisect
 import re
-from .config import SLOT_HOURS
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from . import amenities, analytics, events, occupancy, search, spatial
+from .cache import catalogue_cache
+from .categories import dog_category
+from .config import BOOKING_MAX_RETRIES, SLOT_HOURS
 from .db import get_db
 
+RETRYABLE_ERRORS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT}
+
+
+class BookingError(Exception):
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
 
 def clean_park_name(raw_name):
     """
@@ -30,28 +49,18 @@ def parse_photo_url(photo_id_text):
     return None
 
 
+def invalidate_catalogue():
+    """Drops everything derived from the playgrounds table."""
+    catalogue_cache.clear()
+    spatial.invalidate_index()
+    amenities.invalidate_index()
+    search.invalidate_index()
+
+
 def get_slot_bookings(playground_id, slot_date):
     with get_db() as conn:
         with conn.cursor(dictionary=True) as cur:
-            cur.execute(
-                """
-                SELECT HOUR(b.start_time) AS slot_hour, bc.code AS category_code
-                FROM bookings b
-                JOIN dogs d ON b.dog_id = d.id
-                JOIN breed_categories bc ON d.category_id = bc.id
-                WHERE b.playground_id = %s
-                  AND DATE(b.start_time) = %s
-                  AND b.status = 'confirmed'
-                """,
-                (playground_id, slot_date),
-            )
-            rows = cur.fetchall()
-    bookings_by_hour = {hour: [] for hour in SLOT_HOURS}
-    for row in rows:
-        hour = int(row["slot_hour"])
-        if hour in bookings_by_hour:
-            bookings_by_hour[hour].append(row["category_code"])
-    return bookings_by_hour
+            return occupancy.fetch_day(cur, playground_id, slot_date)
 
 
 def evaluate_slot(existing_categories, requested_category):
@@ -88,19 +97,149 @@ def evaluate_slot(existing_categories, requested_category):
     return False, 8
 
 
+def slot_is_full(categories):
+    """True when evaluate_slot turns away another dog of the slot's own category."""
+    return bool(categories) and not evaluate_slot(categories, categories[-1])[0]
+
+
+def slot_status(count, allowed, limit):
+    if count == 0:
+        return "free"
+    if allowed and count < limit:
+        return "joinable"
+    return "full"
+
+
+# Однобуквенные коды статусов для компактной сетки доступности
+STATUS_CODES = {"free": "f", "joinable": "j", "full": "x"}
+
+
+# evaluate_slot зависит только от числа собак (значимо до 8) и набора
+# присутствующих категорий, поэтому его можно свести к таблице.
+CATEGORY_CODES = list(occupancy.CATEGORY_COLUMNS)
+MAX_SLOT_COUNT = 9
+
+
+def _build_slot_table():
+    table = {}
+    for requested in CATEGORY_CODES:
+        for mask in range(1 << len(CATEGORY_CODES)):
+            present = [
+                code for bit, code in enumerate(CATEGORY_CODES) if mask & (1 << bit)
+            ]
+            for count in range(len(present), MAX_SLOT_COUNT + 1):
+                if count and not present:
+                    continue
+                existing = present + present[:1] * (count - len(present))
+                table[(requested, mask, count)] = evaluate_slot(existing, requested)
+    return table
+
+
+SLOT_TABLE = _build_slot_table()
+
+
+def evaluate_counts(counts, requested_category):
+    """
+    Table-driven evaluate_slot for per-category counts ordered like
+    CATEGORY_CODES. Returns (allowed, limit, total).
+    """
+    total = sum(counts)
+    mask = 0
+    for bit, value in enumerate(counts):
+        if value:
+            mask |= 1 << bit
+    allowed, limit = SLOT_TABLE[
+        (requested_category, mask, min(total, MAX_SLOT_COUNT))
+    ]
+    return allowed, limit, total
+
+
+def build_availability(playground_id, start_date, end_date, requested_category):
+    """
+    Evaluates every (day, hour) in the inclusive range with a single
+    occupancy query. Returns one compact row per day.
+    """
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            occupied = occupancy.fetch_range(cur, playground_id, start_date, end_date)
+
+    empty = (0,) * len(CATEGORY_CODES)
+    days = []
+    day = start_date
+    while day <= end_date:
+        statuses = []
+        counts = []
+        limits = []
+        for hour in SLOT_HOURS:
+            allowed, limit, total = evaluate_counts(
+                occupied.get((day, hour), empty), requested_category
+            )
+            statuses.append(STATUS_CODES[slot_status(total, allowed, limit)])
+            counts.append(total)
+            limits.append(limit)
+        days.append(
+            {
+                "date": day.isoformat(),
+                "statuses": "".join(statuses),
+                "counts": counts,
+                "limits": limits,
+            }
+        )
+        day += timedelta(days=1)
+    return days
+
+
+def find_free_slots(candidates, slot_date, hours, requested_category, limit):
+    """
+    Picks the first `limit` playgrounds (in the given order, e.g. by distance)
+    that have a free or joinable slot for the category in `hours`.
+    `candidates` is a list of (distance, point) pairs from the spatial index.
+    """
+    ids = [point["id"] for _, point in candidates]
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            occupied = occupancy.fetch_many(cur, ids, slot_date, hours[0], hours[-1])
+
+    empty = (0,) * len(CATEGORY_CODES)
+    results = []
+    for distance, point in candidates:
+        slots = []
+        for hour in hours:
+            allowed, slot_limit, total = evaluate_counts(
+                occupied.get((point["id"], hour), empty), requested_category
+            )
+            status = slot_status(total, allowed, slot_limit)
+            if status != "full":
+                slots.append(
+                    {"hour": hour, "status": status, "count": total, "limit": slot_limit}
+                )
+        if slots:
+            results.append(
+                {
+                    "id": point["id"],
+                    "lat": point["lat"],
+                    "lon": point["lon"],
+                    "distance": round(distance),
+                    "slots": slots,
+                }
+            )
+            if len(results) >= limit:
+                break
+    return results
+
+
 def build_slot_statuses(playground_id, slot_date, requested_category):
     bookings_by_hour = get_slot_bookings(playground_id, slot_date)
+    return slot_statuses(bookings_by_hour, requested_category)
+
+
+def slot_statuses(bookings_by_hour, requested_category):
     slots = []
     for hour in SLOT_HOURS:
         existing = bookings_by_hour.get(hour, [])
         allowed, limit = evaluate_slot(existing, requested_category)
         count = len(existing)
-        if count == 0:
-            status = "free"
-        elif allowed and count < limit:
-            status = "joinable"
-        else:
-            status = "full"
+        status = slot_status(count, allowed, limit)
         slots.append(
             {
                 "hour": hour,
@@ -112,3 +251,238 @@ def build_slot_statuses(playground_id, slot_date, requested_category):
             }
         )
     return slots
+
+
+def _dog_owner(cur, dog_id):
+    """Owner of the dog, whose cached /api/me bookings a booking makes stale."""
+    cur.execute("SELECT user_id FROM dogs WHERE id = %s", (dog_id,))
+    row = cur.fetchone()
+    return row["user_id"] if row else None
+
+
+def _book_in_transaction(cur, playground_id, dog_id, start_time):
+    end_time = start_time + timedelta(hours=1)
+    slot_date = start_time.date()
+    slot_hour = start_time.hour
+
+    category_code = dog_category(dog_id, cur)
+    if not category_code:
+        raise BookingError("Dog not found", 404)
+
+    # Порядок блокировок везде одинаковый: брони собаки, затем слот.
+    # Блокирующее чтение по idx_bookings_dog_start ставит next-key блокировки
+    # на интервал, так что параллельная запись той же собаки на то же время
+    # ждёт здесь (REPEATABLE READ).
+    cur.execute(
+        """
+        SELECT id FROM bookings
+        WHERE dog_id = %s
+          AND start_time >= %s
+          AND start_time < %s
+          AND status = 'confirmed'
+        LIMIT 1
+        FOR UPDATE
+        """,
+        (dog_id, start_time, end_time),
+    )
+    if cur.fetchone():
+        raise BookingError("Собака уже записана на это время.")
+
+    existing = occupancy.lock_slot(cur, playground_id, slot_date, slot_hour)
+    allowed, limit = evaluate_slot(existing, category_code)
+    if not allowed or len(existing) >= limit:
+        raise BookingError("Slot is not available for this category")
+
+    cur.execute(
+        """
+        INSERT INTO bookings (playground_id, dog_id, start_time, end_time, status)
+        VALUES (%s, %s, %s, %s, 'confirmed')
+        """,
+        (playground_id, dog_id, start_time, end_time),
+    )
+    booking_id = cur.lastrowid
+    occupancy.adjust(cur, playground_id, slot_date, slot_hour, category_code, 1)
+    categories = existing + [category_code]
+    analytics.record(
+        cur, playground_id, start_time, category_code, 1, int(slot_is_full(categories))
+    )
+    return booking_id, categories, _dog_owner(cur, dog_id)
+
+
+def create_booking(playground_id, dog_id, start_time, max_retries=BOOKING_MAX_RETRIES):
+    """
+    Books a slot in a single transaction. The dog's bookings around the slot
+    and the slot occupancy row are locked, so parallel requests cannot
+    double-book a dog or overfill a slot past the evaluate_slot limits.
+    Deadlocks and lock wait timeouts are retried. Returns (booking id,
+    user id of the dog's owner). Raises BookingError when the booking is
+    rejected.
+    """
+    attempt = 0
+    while True:
+        with get_db() as conn:
+            try:
+                with conn.cursor(dictionary=True) as cur:
+                    booking_id, categories, owner_id = _book_in_transaction(
+                        cur, playground_id, dog_id, start_time
+                    )
+                conn.commit()
+                events.publish_slot(
+                    playground_id, start_time.date(), start_time.hour, categories
+                )
+                return booking_id, owner_id
+            except BookingError:
+                conn.rollback()
+                raise
+            except mysql.connector.Error as exc:
+                conn.rollback()
+                if exc.errno not in RETRYABLE_ERRORS or attempt >= max_retries:
+                    raise
+            attempt += 1
+            time.sleep(0.01 * 2 ** attempt)
+
+
+def expand_recurrence(start_date, end_date, hour, weekdays=None):
+    """
+    Start times at `hour` on every date of the inclusive range whose ISO
+    weekday (1 = Monday) is in `weekdays`; every day when it is empty.
+    """
+    start_times = []
+    day = start_date
+    while day <= end_date:
+        if not weekdays or day.isoweekday() in weekdays:
+            start_times.append(datetime.combine(day, dt_time(hour)))
+        day += timedelta(days=1)
+    return start_times
+
+
+def _book_many_in_transaction(cur, playground_id, dog_id, start_times):
+    category_code = dog_category(dog_id, cur)
+    if not category_code:
+        raise BookingError("Dog not found", 404)
+
+    # Те же блокировки, что и у одиночной брони, но одним запросом на весь
+    # диапазон: сначала брони собаки, затем строки слотов
+    cur.execute(
+        """
+        SELECT start_time FROM bookings
+        WHERE dog_id = %s
+          AND start_time >= %s
+          AND start_time < %s
+          AND status = 'confirmed'
+        ORDER BY start_time
+        FOR UPDATE
+        """,
+        (dog_id, start_times[0], start_times[-1] + timedelta(hours=1)),
+    )
+    dog_busy = [row["start_time"] for row in cur.fetchall()]
+
+    def dog_is_busy(start_time):
+        # Как у одиночной брони: любая бронь собаки в [start, start + 1 ч)
+        position = bisect.bisect_left(dog_busy, start_time)
+        return (
+            position < len(dog_busy)
+            and dog_busy[position] < start_time + timedelta(hours=1)
+        )
+
+    existing_by_slot = occupancy.lock_slots(
+        cur, playground_id, [(start.date(), start.hour) for start in start_times]
+    )
+
+    results = []
+    accepted = []
+    for start_time in start_times:
+        slot = (start_time.date(), start_time.hour)
+        existing = existing_by_slot[slot]
+        allowed, limit = evaluate_slot(existing, category_code)
+        if dog_is_busy(start_time):
+            reason = "Собака уже записана на это время."
+        elif not allowed or len(existing) >= limit:
+            reason = "Slot is not available for this category"
+        else:
+            reason = None
+            existing_by_slot[slot] = existing + [category_code]
+            accepted.append((start_time, slot_is_full(existing_by_slot[slot])))
+        results.append({
+            "slot_date": slot[0].isoformat(),
+            "slot_hour": slot[1],
+            "status": "conflict" if reason else "accepted",
+            "reason": reason,
+        })
+
+    if accepted:
+        values = ", ".join(["(%s, %s, %s, %s, 'confirmed')"] * len(accepted))
+        cur.execute(
+            f"""
+            INSERT INTO bookings (playground_id, dog_id, start_time, end_time, status)
+            VALUES {values}
+            """,
+            [
+                value
+                for start_time, _ in accepted
+                for value in (
+                    playground_id, dog_id, start_time, start_time + timedelta(hours=1)
+                )
+            ],
+        )
+        occupancy.adjust_many(
+            cur,
+            playground_id,
+            [(start.date(), start.hour) for start, _ in accepted],
+            category_code,
+            1,
+        )
+        analytics.record_many(cur, playground_id, accepted, category_code)
+        # id новых броней: строки собаки на эти часы заблокированы нами
+        placeholders = ", ".join(["%s"] * len(accepted))
+        cur.execute(
+            f"""
+            SELECT id, start_time FROM bookings
+            WHERE dog_id = %s AND status = 'confirmed'
+              AND start_time IN ({placeholders})
+            """,
+            (dog_id, *(start for start, _ in accepted)),
+        )
+        ids = {row["start_time"]: row["id"] for row in cur.fetchall()}
+        for result, start_time in zip(results, start_times):
+            if result["status"] == "accepted":
+                result["booking_id"] = ids.get(start_time)
+    return results, existing_by_slot, _dog_owner(cur, dog_id)
+
+
+def create_bookings(playground_id, dog_id, start_times, max_retries=BOOKING_MAX_RETRIES):
+    """
+    Books many slots of one playground for one dog in a single transaction:
+    one locking prefetch of the dog's bookings and of the slot counters,
+    evaluate_slot per slot, then one multi-row insert for the accepted ones.
+    Returns (per-slot results in start time order, user id of the dog's
+    owner); conflicts do not abort the rest of the batch.
+    """
+    start_times = sorted(set(start_times))
+    if not start_times:
+        return [], None
+    attempt = 0
+    while True:
+        with get_db() as conn:
+            try:
+                with conn.cursor(dictionary=True) as cur:
+                    results, existing_by_slot, owner_id = _book_many_in_transaction(
+                        cur, playground_id, dog_id, start_times
+                    )
+                conn.commit()
+                break
+            except BookingError:
+                conn.rollback()
+                raise
+            except mysql.connector.Error as exc:
+                conn.rollback()
+                if exc.errno not in RETRYABLE_ERRORS or attempt >= max_retries:
+                    raise
+            attempt += 1
+            time.sleep(0.01 * 2 ** attempt)
+
+    for result, start_time in zip(results, start_times):
+        if result["status"] == "accepted":
+            slot = (start_time.date(), start_time.hour)
+            events.publish_slot(playground_id, *slot, existing_by_slot[slot])
+    return results, owner_id
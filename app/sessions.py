@@ -0,0 +1,236 @@
+import logging
+import secrets
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from .cache import TTLCache
+from .config import (
+    SESSION_BACKEND,
+    SESSION_MAX_ENTRIES,
+    SESSION_REDIS_URL,
+    SESSION_TTL,
+    USER_CONTEXT_TTL,
+)
+
+try:
+    import redis
+except ImportError:  # redis нужен только для SESSION_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Ошибки хранилища, при которых запрос продолжается без него
+STORE_ERRORS = (redis.RedisError,) if redis is not None else ()
+
+SESSION_PREFIX = "session:"
+USER_PREFIX = "user:"
+
+serializer = TaggedJSONSerializer()
+
+
+class MemorySessionStore:
+    """Process-local store; least recently used entries are evicted first."""
+
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES):
+        self._cache = TTLCache(ttl=SESSION_TTL, max_entries=max_entries)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def stats(self):
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class RedisSessionStore:
+    """Store in Redis or any server speaking its protocol; shared by all workers."""
+
+    def __init__(self, url=SESSION_REDIS_URL):
+        if redis is None:
+            raise RuntimeError("SESSION_BACKEND=redis requires the redis package")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+_store = None
+
+
+def server_sessions_enabled():
+    return SESSION_BACKEND in ("memory", "redis")
+
+
+def get_store():
+    """Session store, or None with SESSION_BACKEND=cookie."""
+    global _store
+    if _store is None and server_sessions_enabled():
+        if SESSION_BACKEND == "redis":
+            _store = RedisSessionStore()
+        else:
+            _store = MemorySessionStore()
+    return _store
+
+
+def store_stats():
+    store = get_store()
+    return store.stats() if store is not None else {"backend": SESSION_BACKEND}
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """New id for the same data; call on login against session fixation."""
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Keeps session data in the session store; the cookie only carries a
+    random session id, so no data is signed with SECRET_KEY.
+    """
+
+    def __init__(self, store=None, ttl=SESSION_TTL):
+        self._store = store
+        self.ttl = ttl
+
+    @property
+    def store(self):
+        return self._store or get_store()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.config["SESSION_COOKIE_NAME"])
+        if sid:
+            try:
+                raw = self.store.get(SESSION_PREFIX + sid)
+            except STORE_ERRORS:
+                # Хранилище недоступно: анонимная сессия, публичные страницы работают
+                logger.exception("Session store read failed")
+                raw = None
+            if raw is not None:
+                try:
+                    return ServerSession(serializer.loads(raw), sid=sid)
+                except ValueError:
+                    pass
+        return ServerSession(sid=new_session_id(), new=True)
+
+    def save_session(self, app, session, response):
+        try:
+            self._save_session(app, session, response)
+        except STORE_ERRORS:
+            # Сессия не сохранена; ответ уходит без новой cookie
+            logger.exception("Session store write failed")
+
+    def _save_session(self, app, session, response):
+        name = app.config["SESSION_COOKIE_NAME"]
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.previous_sid:
+            self.store.delete(SESSION_PREFIX + session.previous_sid)
+        if not session.modified:
+            return
+        if not session:
+            if not session.new:
+                response.delete_cookie(name, domain=domain, path=path)
+            self.store.delete(SESSION_PREFIX + session.sid)
+            return
+        self.store.set(SESSION_PREFIX + session.sid, serializer.dumps(dict(session)), self.ttl)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def regenerate(session):
+    """New session id on login against session fixation; cookie sessions need none."""
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+# Контекст пользователя (профиль, собаки, первая страница броней) кэшируется
+# в хранилище сессий по user_id, поэтому общий для всех сессий пользователя.
+# Каждая часть — отдельный ключ, чтобы сбрасывать их независимо. Без
+# серверного хранилища кэша нет: сброс в одном воркере не дошёл бы до других.
+USER_CONTEXT_PARTS = ("profile", "dogs", "bookings")
+
+
+def _user_key(user_id, part):
+    return f"{USER_PREFIX}{user_id}:{part}"
+
+
+def cached_user_part(user_id, part, load):
+    """Value of a context part, calling `load()` and caching it on a miss."""
+    store = get_store()
+    if store is None:
+        return load()
+    try:
+        raw = store.get(_user_key(user_id, part))
+    except STORE_ERRORS:
+        logger.exception("User context read failed")
+        return load()
+    if raw is not None:
+        return serializer.loads(raw)
+    value = load()
+    if value is not None:
+        try:
+            store.set(_user_key(user_id, part), serializer.dumps(value), USER_CONTEXT_TTL)
+        except STORE_ERRORS:
+            logger.exception("User context write failed")
+    return value
+
+
+def invalidate_user(user_id, *parts):
+    """Drops the given context parts of a user (all of them by default)."""
+    store = get_store()
+    if not user_id or store is None:
+        return
+    try:
+        for part in parts or USER_CONTEXT_PARTS:
+            store.delete(_user_key(user_id, part))
+    except STORE_ERRORS:
+        # Устаревшая запись проживёт не дольше USER_CONTEXT_TTL
+        logger.exception("User context invalidation failed")
+
+
+def init_app(app):
+    if server_sessions_enabled():
+        app.session_interface = ServerSessionInterface()
@@ -0,0 +1,225 @@
+import math
+import time
+
+from .config import MAP_INDEX_TTL
+from .db import get_db
+from .indexes import SharedIndex
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = 111320.0
+
+# Размер ячейки сетки в градусах (~1 км по широте для Москвы)
+CELL_SIZE = 0.01
+
+# Предельный радиус поиска ?near= (м): Москва целиком
+MAX_RADIUS_M = 60000
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def radius_bbox(lat, lon, radius_m):
+    """Returns (min_lon, min_lat, max_lon, max_lat) enclosing the circle."""
+    d_lat = radius_m / METERS_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    d_lon = radius_m / (METERS_PER_DEGREE * cos_lat)
+    return lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over playground points.
+
+    Viewport and radius queries are answered without touching MySQL; amenity
+    filters come from amenities.AmenityIndex.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.points = {}
+        self.cells = {}
+        self.built_at = time.monotonic()
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size))
+
+    def add(self, point):
+        self.points[point["id"]] = point
+        self.cells.setdefault(self._cell(point["lat"], point["lon"]), []).append(point)
+
+    def __len__(self):
+        return len(self.points)
+
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        min_row, min_col = self._cell(min_lat, min_lon)
+        max_row, max_col = self._cell(max_lat, max_lon)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            # Окно больше заполненной части сетки: обходим только занятые ячейки
+            candidates = [
+                point
+                for (row, col), points in self.cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+                for point in points
+            ]
+        else:
+            candidates = []
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    candidates.extend(self.cells.get((row, col), ()))
+        return [
+            point
+            for point in candidates
+            if min_lat <= point["lat"] <= max_lat and min_lon <= point["lon"] <= max_lon
+        ]
+
+    def query_radius(self, lat, lon, radius_m):
+        result = []
+        for point in self.query_bbox(*radius_bbox(lat, lon, radius_m)):
+            distance = haversine_m(lat, lon, point["lat"], point["lon"])
+            if distance <= radius_m:
+                result.append((distance, point))
+        result.sort(key=lambda item: item[0])
+        return result
+
+
+POINTS_SQL = """
+    SELECT id,
+           CAST(lat AS DOUBLE) AS lat,
+           CAST(lon AS DOUBLE) AS lon
+    FROM playgrounds
+    WHERE lat IS NOT NULL AND lon IS NOT NULL
+"""
+
+
+def point_from_row(row):
+    return {
+        "id": row["id"],
+        "lat": float(row["lat"]),
+        "lon": float(row["lon"]),
+    }
+
+
+def load_points():
+    with get_db() as conn:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(POINTS_SQL)
+            rows = cur.fetchall()
+    return [point_from_row(row) for row in rows]
+
+
+def build_index(points=None):
+    index = GridIndex()
+    for point in load_points() if points is None else points:
+        index.add(point)
+    return index
+
+
+_shared = SharedIndex("Spatial index", build_index, MAP_INDEX_TTL)
+
+
+def get_index():
+    """The shared grid, rebuilt in the background past MAP_INDEX_TTL."""
+    return _shared.get()
+
+
+def current_index():
+    """The built index or None, without triggering a build."""
+    return _shared.current()
+
+
+def install_index(index):
+    """Replaces the shared index, e.g. with one built by the async app."""
+    _shared.install(index)
+
+
+def invalidate_index():
+    """Drops the index; it is rebuilt on the next query."""
+    _shared.invalidate()
+
+
+def _parse_floats(raw, count):
+    parts = [float(part) for part in raw.split(",")]
+    if len(parts) != count:
+        raise ValueError(f"expected {count} numbers")
+    if not all(math.isfinite(part) for part in parts):
+        raise ValueError("coordinates must be finite")
+    return parts
+
+
+def parse_bbox(raw):
+    """Parses 'min_lon,min_lat,max_lon,max_lat' (Leaflet toBBoxString order)."""
+    min_lon, min_lat, max_lon, max_lat = _parse_floats(raw, 4)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox corners are swapped")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_point(raw):
+    lat, lon = _parse_floats(raw, 2)
+    return lat, lon
+
+
+def parse_radius(raw, default, maximum):
+    """Radius in metres; must be finite, positive and at most `maximum`."""
+    radius = float(raw) if raw else default
+    if not math.isfinite(radius) or radius <= 0 or radius > maximum:
+        raise ValueError(f"radius must be between 0 and {maximum} m")
+    return radius
+
+
+def parse_index_query(bbox, near, radius=None, limit=None):
+    """Validates bbox/near query params into keyword arguments for query_points."""
+    query = {"limit": int(limit) if limit else None}
+    if query["limit"] is not None and query["limit"] <= 0:
+        raise ValueError("limit must be positive")
+    if near:
+        query["near"] = parse_point(near)
+        query["radius"] = parse_radius(radius, 1000.0, MAX_RADIUS_M)
+    else:
+        query["bbox"] = parse_bbox(bbox)
+    return query
+
+
+def points_for_ids(index, ids):
+    """Map points (id, lat, lon) for `ids` that have coordinates, in that order."""
+    rows = []
+    for playground_id in ids:
+        point = index.points.get(playground_id)
+        if point is not None:
+            rows.append({"id": point["id"], "lat": point["lat"], "lon": point["lon"]})
+    return rows
+
+
+def query_points(index, allowed=None, bbox=None, near=None, radius=None, limit=None):
+    """
+    Map points for a viewport or a radius around `near`. `allowed` is the
+    set of ids passing the amenity filters, None for no filtering.
+    """
+    rows = []
+    if near:
+        for distance, point in index.query_radius(near[0], near[1], radius):
+            if allowed is None or point["id"] in allowed:
+                rows.append(
+                    {
+                        "id": point["id"],
+                        "lat": point["lat"],
+                        "lon": point["lon"],
+                        "distance": round(distance),
+                    }
+                )
+    else:
+        for point in index.query_bbox(*bbox):
+            if allowed is None or point["id"] in allowed:
+                rows.append({"id": point["id"], "lat": point["lat"], "lon": point["lon"]})
+    if limit:
+        rows = rows[:limit]
+    return rows
@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# Асинхронный режим: uvicorn asgi:app (зависимости из requirements-async.txt)
+app = create_asgi_app()
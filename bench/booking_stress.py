@@ -0,0 +1,127 @@
+"""
+Concurrency stress check for POST /api/book.
+
+Fires many parallel bookings for one slot against a running server and then
+verifies, straight from the database, that the slot still satisfies the
+evaluate_slot limits (8 dogs, 2 for HIGH_RISK, no forbidden mixes).
+
+    python -m bench.booking_stress --url http://127.0.0.1:5000 \\
+        --playground 1 --date 2030-01-01 --hour 10 --requests 300
+"""
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db import get_db
+
+
+def slot_violations(categories):
+    counts = Counter(categories)
+    total = len(categories)
+    problems = []
+    if counts["HIGH_RISK"]:
+        if total > 2:
+            problems.append(f"HIGH_RISK slot has {total} dogs (limit 2)")
+        if total != counts["HIGH_RISK"]:
+            problems.append("HIGH_RISK mixed with other categories")
+    elif counts["SMALL"]:
+        if total > 8:
+            problems.append(f"SMALL slot has {total} dogs (limit 8)")
+        if total != counts["SMALL"]:
+            problems.append("SMALL mixed with other categories")
+    elif total > 8:
+        problems.append(f"slot has {total} dogs (limit 8)")
+    return problems
+
+
+def load_dog_ids(limit):
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM dogs ORDER BY RAND() LIMIT %s", (limit,))
+            return [row[0] for row in cur.fetchall()]
+
+
+def load_slot(playground_id, slot_date, slot_hour):
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT bc.code
+                FROM bookings b
+                JOIN dogs d ON b.dog_id = d.id
+                JOIN breed_categories bc ON d.category_id = bc.id
+                WHERE b.playground_id = %s
+                  AND b.slot_date = %s
+                  AND b.slot_hour = %s
+                  AND b.status = 'confirmed'
+                """,
+                (playground_id, slot_date, slot_hour),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+
+def post_booking(url, payload):
+    request = urllib.request.Request(
+        f"{url}/api/book",
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+    except OSError:
+        return "error"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--playground", type=int, required=True)
+    parser.add_argument("--date", required=True)
+    parser.add_argument("--hour", type=int, required=True)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    dog_ids = load_dog_ids(args.requests)
+    if not dog_ids:
+        print("No dogs in the database", file=sys.stderr)
+        return 2
+    before = len(load_slot(args.playground, args.date, args.hour))
+    payloads = [
+        {
+            "playground_id": args.playground,
+            "slot_date": args.date,
+            "slot_hour": args.hour,
+            "dog_id": dog_ids[i % len(dog_ids)],
+        }
+        for i in range(args.requests)
+    ]
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        statuses = Counter(pool.map(lambda p: post_booking(args.url, p), payloads))
+    print("responses:", dict(statuses))
+
+    categories = load_slot(args.playground, args.date, args.hour)
+    print("slot contents:", dict(Counter(categories)))
+    problems = slot_violations(categories)
+    for problem in problems:
+        print("VIOLATION:", problem, file=sys.stderr)
+    if before + statuses[200] != len(categories):
+        print(
+            f"VIOLATION: {before} + {statuses[200]} successful bookings but "
+            f"{len(categories)} in the slot",
+            file=sys.stderr,
+        )
+        return 1
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
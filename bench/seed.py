@@ -0,0 +1,242 @@
+"""
+Seeds a benchmark database with a reproducible synthetic dataset.
+
+Playgrounds go through the regular importer (so normalized columns are
+filled exactly as in production), users, dogs and bookings are bulk-inserted,
+and slot_occupancy and booking_stats are rebuilt at the end. The same --seed always produces
+the same rows.
+
+Point DB_NAME at a scratch schema; pending migrations are applied first:
+
+    DB_NAME=dog_playgrounds_bench python -m bench.seed --playgrounds 20000 \\
+        --users 50000 --dogs 150000 --bookings 500000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import analytics, migrations, occupancy
+from app.config import DB_CONFIG, PASSWORD_HASH_METHOD
+from app.db import get_db
+from app.importer import import_records
+
+# Синтетические площадки получают global_id из этого диапазона
+GLOBAL_ID_BASE = 900_000_000
+
+DISTRICTS = [
+    "район Арбат", "район Сокол", "район Хамовники", "район Сокольники",
+    "Басманный район", "район Марьино", "район Митино", "Пресненский район",
+    "район Черёмушки", "район Бибирево", "район Лефортово", "район Люблино",
+    "район Измайлово", "район Отрадное", "район Строгино", "Тверской район",
+    "район Южное Бутово", "район Ясенево", "район Кунцево", "район Раменки",
+]
+STREETS = [
+    "улица Ленина", "Ленинский проспект", "улица Вавилова", "Профсоюзная улица",
+    "улица Ёлочная", "Садовая улица", "Берёзовая аллея", "улица Гарибальди",
+    "Нахимовский проспект", "улица Академика Королёва",
+]
+PARKS = ["Сквер", "Парк", "Бульвар", "Парк Победы", "Лесопарк", "Сад"]
+ELEMENTS = [
+    "Бум", "Барьер", "Лестница", "Горка", "Тоннель", "Кольцо", "Слалом",
+    "Мишень", "Стенка", "Змейка",
+]
+BREEDS = {
+    "SMALL": ["Чихуахуа", "Той-терьер", "Мопс", "Шпиц"],
+    "STANDARD": ["Бигль", "Корги", "Пудель", "Спаниель"],
+    "ACTIVE": ["Хаски", "Бордер-колли", "Лабрадор", "Овчарка"],
+    "HIGH_RISK": ["Питбуль", "Ротвейлер", "Доберман", "Алабай"],
+}
+CATEGORY_WEIGHTS = {"SMALL": 3, "STANDARD": 4, "ACTIVE": 3, "HIGH_RISK": 1}
+
+# Москва: рабочая область координат
+LAT_RANGE = (55.57, 55.91)
+LON_RANGE = (37.37, 37.85)
+
+
+def playground_records(rng, count):
+    for i in range(count):
+        district = rng.choice(DISTRICTS)
+        elements = rng.sample(ELEMENTS, rng.randint(0, 5))
+        yield {
+            "global_id": GLOBAL_ID_BASE + i,
+            "AdmArea": "город Москва",
+            "District": district,
+            "Address": f"{rng.choice(STREETS)}, дом {rng.randint(1, 120)}",
+            "ParkName": f"{rng.choice(PARKS)} {district.replace('район', '').strip()} №{i}",
+            "DogParkArea": str(rng.randint(200, 1500)),
+            "Elements": json.dumps([{"ElementType": name} for name in elements],
+                                   ensure_ascii=False),
+            "Lighting": rng.choice(["да", "да", "нет"]),
+            "Fencing": rng.choice(["да", "да", "да", "нет"]),
+            "WorkingHours": "[]",
+            "Latitude_WGS84": round(rng.uniform(*LAT_RANGE), 6),
+            "Longitude_WGS84": round(rng.uniform(*LON_RANGE), 6),
+        }
+
+
+def insert_batches(conn, sql, rows, batch_size):
+    batch = []
+    total = 0
+    with conn.cursor() as cur:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cur.executemany(sql, batch)
+                conn.commit()
+                total += len(batch)
+                batch.clear()
+        if batch:
+            cur.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+    return total
+
+
+def fetch_ids(conn, sql, params=()):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return [row[0] for row in cur.fetchall()]
+
+
+def seed(conn, seed_value, playgrounds, users, dogs, bookings, days, batch_size, log):
+    rng = random.Random(seed_value)
+    prefix = f"bench{seed_value}_"
+    if fetch_ids(conn, "SELECT id FROM users WHERE username LIKE %s LIMIT 1", (prefix + "%",)):
+        raise SystemExit(f"Database already seeded with --seed {seed_value}")
+
+    started = time.perf_counter()
+    stats = import_records(conn, playground_records(rng, playgrounds), batch_size)
+    log(f"playgrounds: {stats.upserted} upserted, {stats.rejected} rejected")
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, code FROM breed_categories")
+        category_ids = {code: category_id for category_id, code in cur.fetchall()}
+    missing = set(CATEGORY_WEIGHTS) - set(category_ids)
+    if missing:
+        raise SystemExit(f"breed_categories is missing {sorted(missing)}")
+
+    # Один хэш на всех: пароль "bench" у каждого синтетического пользователя
+    password_hash = generate_password_hash("bench", PASSWORD_HASH_METHOD)
+    inserted = insert_batches(
+        conn,
+        "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+        (
+            (f"{prefix}{i}", f"{prefix}{i}@example.test", password_hash)
+            for i in range(users)
+        ),
+        batch_size,
+    )
+    log(f"users: {inserted}")
+    user_ids = fetch_ids(
+        conn, "SELECT id FROM users WHERE username LIKE %s ORDER BY id", (prefix + "%",)
+    )
+
+    codes = list(CATEGORY_WEIGHTS)
+    weights = [CATEGORY_WEIGHTS[code] for code in codes]
+
+    def dog_rows():
+        for i in range(dogs):
+            code = rng.choices(codes, weights)[0]
+            yield (
+                rng.choice(user_ids),
+                category_ids[code],
+                f"Пёс {i}",
+                rng.choice(BREEDS[code]),
+            )
+
+    inserted = insert_batches(
+        conn,
+        "INSERT INTO dogs (user_id, category_id, name, breed) VALUES (%s, %s, %s, %s)",
+        dog_rows(),
+        batch_size,
+    )
+    log(f"dogs: {inserted}")
+    dog_ids = fetch_ids(
+        conn,
+        "SELECT d.id FROM dogs d JOIN users u ON d.user_id = u.id WHERE u.username LIKE %s "
+        "ORDER BY d.id",
+        (prefix + "%",),
+    )
+    playground_ids = fetch_ids(
+        conn, "SELECT id FROM playgrounds WHERE global_id >= %s ORDER BY id", (GLOBAL_ID_BASE,)
+    )
+
+    # Брони раскиданы по прошлому и будущему, пиковые часы вечером и утром
+    first_day = date.today() - timedelta(days=days // 2)
+    hours = list(range(6, 23))
+    hour_weights = [3 if hour in (7, 8, 18, 19, 20) else 1 for hour in hours]
+
+    def booking_rows():
+        for _ in range(bookings):
+            start = datetime.combine(
+                first_day + timedelta(days=rng.randrange(days)), datetime.min.time()
+            ).replace(hour=rng.choices(hours, hour_weights)[0])
+            yield (
+                rng.choice(playground_ids),
+                rng.choice(dog_ids),
+                start,
+                start + timedelta(hours=1),
+                "confirmed" if rng.random() < 0.9 else "cancelled",
+            )
+
+    inserted = insert_batches(
+        conn,
+        """
+        INSERT INTO bookings (playground_id, dog_id, start_time, end_time, status)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        booking_rows(),
+        batch_size,
+    )
+    log(f"bookings: {inserted}")
+    log(f"slot_occupancy rows: {occupancy.rebuild(conn)}")
+    log(f"booking_stats rows: {analytics.rebuild(conn)}")
+    log(f"done in {time.perf_counter() - started:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--playgrounds", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--dogs", type=int, default=150000)
+    parser.add_argument("--bookings", type=int, default=500000)
+    parser.add_argument("--days", type=int, default=365, help="booking date spread")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="allow seeding a database whose name does not end with _bench",
+    )
+    args = parser.parse_args(argv)
+
+    if not str(DB_CONFIG["database"]).endswith("_bench") and not args.force:
+        print(
+            f"Refusing to seed {DB_CONFIG['database']!r}: use a *_bench schema or --force",
+            file=sys.stderr,
+        )
+        return 2
+
+    with get_db() as conn:
+        migrations.migrate(conn)
+        seed(
+            conn,
+            args.seed,
+            args.playgrounds,
+            args.users,
+            args.dogs,
+            args.bookings,
+            args.days,
+            args.batch_size,
+            lambda message: print(message, file=sys.stderr),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
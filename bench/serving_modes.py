@@ -0,0 +1,95 @@
+"""
+Compares the sync (WSGI) and async (ASGI) serving modes on the read endpoints.
+
+Start both servers against the same database, e.g.
+
+    gunicorn -w 4 -b 127.0.0.1:8000 app:app
+    uvicorn --workers 4 --port 8001 asgi:app
+
+then run
+
+    python -m bench.serving_modes --sync-url http://127.0.0.1:8000 \\
+        --async-url http://127.0.0.1:8001 --district "район Сокол"
+
+Two scenarios are measured. "cached" repeats a few catalogue requests;
+after the first hit both modes answer them from the in-process
+catalogue_cache and indexes, so it measures cache serving rather than
+blocking vs non-blocking DB access. "uncached" varies the playground and
+dog of /api/playgrounds/<id>/details and adds a throwaway parameter to
+/api/districts, so every request reaches MySQL; compare the modes on it.
+"""
+import argparse
+import json
+from urllib.parse import quote
+
+from bench.loadgen import run_load
+
+
+def cached_paths(district, playground_id):
+    district_param = quote(district)
+    return [
+        "/api/districts",
+        f"/api/playgrounds?district={district_param}",
+        f"/api/playgrounds/search?district={district_param}",
+        f"/api/playgrounds/{playground_id}/details",
+        "/api/playgrounds?bbox=37.55,55.72,37.68,55.78",
+    ]
+
+
+def uncached_path(i, playgrounds, dogs):
+    """i-th request of the uncached scenario; no two share a cache key."""
+    if i % 4 == 3:
+        return f"/api/districts?nocache={i}"
+    playground_id = 1 + i * 7919 % playgrounds
+    return f"/api/playgrounds/{playground_id}/details?dog_id={1 + i % dogs}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sync-url", required=True)
+    parser.add_argument("--async-url", required=True)
+    parser.add_argument("--district", required=True)
+    parser.add_argument("--playground", type=int, default=1)
+    parser.add_argument(
+        "--playgrounds", type=int, default=20000, help="ids 1..N used by the uncached scenario"
+    )
+    parser.add_argument(
+        "--dogs", type=int, default=150000, help="ids 1..N used by the uncached scenario"
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    paths = cached_paths(args.district, args.playground)
+    # Без If-None-Match: измеряем полную отдачу, а не 304
+    scenarios = {
+        "cached": lambda i: ("GET", paths[i % len(paths)], None, {}),
+        "uncached": lambda i: (
+            "GET", uncached_path(i, args.playgrounds, args.dogs), None, {}
+        ),
+    }
+
+    results = {}
+    for scenario, factory in scenarios.items():
+        for mode, url in (("sync", args.sync_url), ("async", args.async_url)):
+            run_load(url, factory, concurrency=args.concurrency, requests=len(paths) * 5)
+            results[f"{scenario}/{mode}"] = run_load(
+                url, factory, concurrency=args.concurrency, requests=args.requests
+            )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    columns = ["requests", "errors", "rps", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    print(f"{'mode':<15} " + " ".join(f"{column:>9}" for column in columns))
+    for mode, stats in results.items():
+        print(f"{mode:<15} " + " ".join(f"{str(stats[column]):>9}" for column in columns))
+    print(
+        "cached: answered from catalogue_cache after the first hit in both modes; "
+        "uncached: every request reads MySQL"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Runs the endpoint benchmark suite against a running server and stores results.
+
+Seed a scratch database first (python -m bench.seed), start the app against
+it, then run
+
+    python -m bench.suite --url http://127.0.0.1:5000 --concurrency 50
+
+Each run is written to bench/results/<timestamp>-<commit>.json and compared
+with the previous run, so regressions between commits are visible.
+--max-regression makes the exit status non-zero when a scenario's p99
+latency grows by more than the given percentage.
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import quote, urlencode
+
+from bench.booking_stress import load_dog_ids
+from bench.loadgen import run_load
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Окно карты на уровне района: ~2 x 1.5 км
+VIEWPORT = (0.03, 0.015)
+MOSCOW = (37.37, 55.57, 37.85, 55.91)
+
+
+def fetch_json(url, path):
+    with urllib.request.urlopen(f"{url}{path}", timeout=60) as response:
+        return json.load(response)
+
+
+def load_context(url, dogs):
+    bbox = ",".join(str(value) for value in MOSCOW)
+    points = fetch_json(url, f"/api/playgrounds?bbox={bbox}&format=columns")
+    return {
+        "districts": fetch_json(url, "/api/districts"),
+        "playground_ids": points["ids"],
+        "dog_ids": load_dog_ids(dogs) if dogs else [],
+    }
+
+
+def viewport_path(rng):
+    lon = rng.uniform(MOSCOW[0], MOSCOW[2] - VIEWPORT[0])
+    lat = rng.uniform(MOSCOW[1], MOSCOW[3] - VIEWPORT[1])
+    bbox = f"{lon:.5f},{lat:.5f},{lon + VIEWPORT[0]:.5f},{lat + VIEWPORT[1]:.5f}"
+    return f"/api/playgrounds?{urlencode({'bbox': bbox, 'format': 'binary'})}"
+
+
+def scenarios(context, seed):
+    """name -> request_factory(i) for bench.loadgen.run_load."""
+    rng = random.Random(seed)
+    districts = context["districts"]
+    ids = context["playground_ids"]
+    dog_ids = context["dog_ids"]
+    gzip = {"Accept-Encoding": "gzip"}
+    first_day = date.today() + timedelta(days=1)
+
+    def map_load(i):
+        return "GET", viewport_path(rng), None, gzip
+
+    def district_map(i):
+        district = quote(districts[i % len(districts)])
+        return "GET", f"/api/playgrounds?district={district}", None, gzip
+
+    def district_search(i):
+        district = quote(districts[i % len(districts)])
+        return "GET", f"/api/playgrounds/search?district={district}", None, gzip
+
+    def details(i):
+        return "GET", f"/api/playgrounds/{rng.choice(ids)}/details", None, gzip
+
+    week = f"from={first_day}&to={first_day + timedelta(days=6)}"
+
+    def availability(i):
+        return "GET", f"/api/playgrounds/{rng.choice(ids)}/availability?{week}", None, gzip
+
+    # Всплеск бронирований: мало площадок и часов, чтобы транзакции спорили
+    hot_playgrounds = ids[:20]
+
+    def booking_burst(i):
+        payload = {
+            "playground_id": rng.choice(hot_playgrounds),
+            "slot_date": str(first_day + timedelta(days=rng.randrange(3))),
+            "slot_hour": rng.choice((8, 18, 19)),
+            "dog_id": rng.choice(dog_ids),
+        }
+        return "POST", "/api/book", json.dumps(payload).encode(), {
+            "Content-Type": "application/json"
+        }
+
+    result = {
+        "map_load": map_load,
+        "district_map": district_map,
+        "district_search": district_search,
+        "details": details,
+        "availability": availability,
+    }
+    if dog_ids:
+        result["booking_burst"] = booking_burst
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def previous_result(exclude=None):
+    files = sorted(RESULTS_DIR.glob("*.json"))
+    files = [path for path in files if path != exclude]
+    if not files:
+        return None
+    return json.loads(files[-1].read_text())
+
+
+def compare(current, previous, max_regression):
+    """Prints per-scenario deltas; returns names whose p99 regressed too much."""
+    regressed = []
+    print(f"\ncompared with {previous['commit']} ({previous['started']})")
+    for name, stats in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before or not before.get("p99_ms") or not stats.get("p99_ms"):
+            continue
+        rps_delta = _delta(stats["rps"], before["rps"])
+        p99_delta = _delta(stats["p99_ms"], before["p99_ms"])
+        print(f"{name:<16} rps {rps_delta:+7.1f}%   p99 {p99_delta:+7.1f}%")
+        if max_regression is not None and p99_delta > max_regression:
+            regressed.append(name)
+    return regressed
+
+
+def _delta(value, base):
+    return (value - base) / base * 100 if base else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000, help="per scenario")
+    parser.add_argument("--warmup", type=int, default=200, help="per scenario")
+    parser.add_argument("--dogs", type=int, default=2000, help="0 skips booking_burst")
+    parser.add_argument("--only", action="append", help="run only these scenarios")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="free-form note stored with the run")
+    parser.add_argument("--max-regression", type=float, help="allowed p99 growth, %%")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    context = load_context(args.url, args.dogs)
+    if not context["playground_ids"] or not context["districts"]:
+        print("The server returned no playgrounds; seed the database first", file=sys.stderr)
+        return 2
+
+    run = {
+        "commit": git_commit(),
+        "label": args.label,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "playgrounds": len(context["playground_ids"]),
+        "scenarios": {},
+    }
+    columns = ["requests", "errors", "rps", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    print(f"{'scenario':<16} " + " ".join(f"{column:>9}" for column in columns))
+    for name, factory in scenarios(context, args.seed).items():
+        if args.only and name not in args.only:
+            continue
+        if args.warmup:
+            run_load(args.url, factory, concurrency=args.concurrency, requests=args.warmup)
+        stats = run_load(
+            args.url, factory, concurrency=args.concurrency, requests=args.requests
+        )
+        run["scenarios"][name] = stats
+        print(f"{name:<16} " + " ".join(f"{str(stats[column]):>9}" for column in columns))
+
+    path = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{run['commit']}.json"
+        path.write_text(json.dumps(run, indent=2, ensure_ascii=False))
+        print(f"\nsaved {path.relative_to(RESULTS_DIR.parent.parent)}")
+
+    previous = previous_result(exclude=path)
+    if previous:
+        regressed = compare(run, previous, args.max_regression)
+        if regressed:
+            print(f"p99 regression in: {', '.join(regressed)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
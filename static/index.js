@@ -1,5 +1,6 @@
 const districtSelect = document.getElementById("districtSelect");
 const searchBtn = document.getElementById("searchBtn");
+const searchQuery = document.getElementById("searchQuery");
 const openMapBtn = document.getElementById("openMapBtn");
 let tomSelectInstance = null;
 const searchResults = document.getElementById("searchResults");
@@ -69,11 +70,18 @@ function updateMapLink() {
 
 async function searchPlaygrounds() {
   const district = districtSelect.value;
-  if (!district) {
+  const query = searchQuery.value.trim();
+  if (!district && !query) {
     return;
   }
   
-  const params = { district };
+  const params = {};
+  if (district) {
+    params.district = district;
+  }
+  if (query) {
+    params.q = query;
+  }
   
   // Добавляем фильтры
   if (document.getElementById("filterLighting")?.checked) {
@@ -100,7 +108,7 @@ async function searchPlaygrounds() {
 
 function applyFilters() {
   const district = districtSelect.value;
-  if (district) {
+  if (district || searchQuery.value.trim()) {
     searchPlaygrounds();
   }
 }
@@ -128,7 +136,7 @@ function renderResults(items, district) {
         : `Площадка №${item.id}`;
     const link = document.createElement("a");
     link.className = "list-group-item list-group-item-action";
-    link.href = `/map?district=${encodeURIComponent(district)}&playground_id=${item.id}`;
+    link.href = `/map?district=${encodeURIComponent(district || item.district || "")}&playground_id=${item.id}`;
     link.target = "_blank";
     link.rel = "noopener";
 
@@ -248,6 +256,11 @@ async function checkAuth() {
 
 
 searchBtn.addEventListener("click", searchPlaygrounds);
+searchQuery.addEventListener("keydown", (event) => {
+  if (event.key === "Enter") {
+    searchPlaygrounds();
+  }
+});
 
 function setupFilters() {
   const lightingCheckbox = document.getElementById("filterLighting");
@@ -13,37 +13,49 @@ function showStatus(message, isSuccess) {
   addDogStatus.classList.add(isSuccess ? "alert-success" : "alert-danger");
 }
 
-async function loadUser() {
+function renderUser(user) {
+  userInfo.innerHTML = `
+    <div><strong>Логин:</strong> ${user.username}</div>
+    <div><strong>Email:</strong> ${user.email}</div>
+  `;
+}
+
+function renderDogs(dogs) {
+  dogsList.innerHTML = "";
+  if (!dogs.length) {
+    dogsList.innerHTML = "<div class=\"text-muted\">Питомцы не добавлены.</div>";
+    return;
+  }
+  dogs.forEach((dog) => {
+    const item = document.createElement("div");
+    item.className = "list-group-item";
+    item.innerHTML = `
+      <div class="fw-semibold">${dog.name}</div>
+      <div class="small text-muted">${dog.category_code} ${dog.breed ? `• ${dog.breed}` : ""}</div>
+    `;
+    dogsList.appendChild(item);
+  });
+}
+
+// Профиль, питомцы и первая страница записей одним запросом
+async function loadProfile() {
   try {
-    const response = await axios.get("/api/me");
+    const response = await axios.get("/api/me", {
+      params: { include: "dogs,bookings" },
+    });
     const user = response.data;
-    userInfo.innerHTML = `
-      <div><strong>Логин:</strong> ${user.username}</div>
-      <div><strong>Email:</strong> ${user.email}</div>
-    `;
+    renderUser(user);
+    renderDogs(user.dogs || []);
+    renderBookings(user.bookings || [], user.bookings_next_cursor || null, false);
   } catch (error) {
     window.location.href = "/";
   }
 }
 
 async function loadDogs() {
-  dogsList.innerHTML = "";
   try {
     const response = await axios.get("/api/my-dogs");
-    const dogs = response.data || [];
-    if (!dogs.length) {
-      dogsList.innerHTML = "<div class=\"text-muted\">Питомцы не добавлены.</div>";
-      return;
-    }
-    dogs.forEach((dog) => {
-      const item = document.createElement("div");
-      item.className = "list-group-item";
-      item.innerHTML = `
-        <div class="fw-semibold">${dog.name}</div>
-        <div class="small text-muted">${dog.category_code} ${dog.breed ? `• ${dog.breed}` : ""}</div>
-      `;
-      dogsList.appendChild(item);
-    });
+    renderDogs(response.data || []);
   } catch (error) {
     dogsList.innerHTML = "<div class=\"text-danger\">Ошибка загрузки.</div>";
   }
@@ -79,43 +91,85 @@ logoutBtn.addEventListener("click", async () => {
 
 const bookingsList = document.getElementById("bookingsList");
 
-async function loadBookings() {
-  bookingsList.innerHTML = "";
+// Следующая страница истории (курсор из заголовка X-Next-Cursor)
+let bookingsCursor = null;
+
+async function loadBookings(after = null) {
   try {
-    const response = await axios.get("/api/my-bookings");
-    const bookings = response.data || [];
-    if (!bookings.length) {
-      bookingsList.innerHTML = "<div class=\"text-muted\">История записей пуста.</div>";
-      return;
-    }
-    bookings.forEach((booking) => {
-      const item = document.createElement("div");
-      item.className = "list-group-item";
-      
-      const dateObj = new Date(booking.start_time);
-      const dateStr = dateObj.toLocaleDateString();
-      const timeStr = dateObj.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
-
-      const parkName =
-        booking.park_name && booking.park_name !== "[]"
-          ? booking.park_name
-          : `Площадка №${booking.playground_id}`;
-
-      item.innerHTML = `
-        <div class="d-flex w-100 justify-content-between">
-            <h6 class="mb-1">${parkName}</h6>
-            <small class="text-muted">${dateStr} ${timeStr}</small>
-        </div>
-        <p class="mb-1 small text-muted">${booking.address || ""}</p>
-        <small class="text-primary">Собака: ${booking.dog_name}</small>
-      `;
-      bookingsList.appendChild(item);
+    const response = await axios.get("/api/my-bookings", {
+      params: after ? { after } : {},
     });
+    renderBookings(
+      response.data || [],
+      response.headers["x-next-cursor"] || null,
+      Boolean(after)
+    );
   } catch (error) {
     bookingsList.innerHTML = "<div class=\"text-danger\">Ошибка загрузки истории.</div>";
   }
 }
 
-loadUser();
-loadDogs();
-loadBookings();
\ No newline at end of file
+function renderBookings(bookings, nextCursor, append) {
+  if (!append) {
+    bookingsList.innerHTML = "";
+  }
+  document.getElementById("moreBookingsBtn")?.remove();
+  bookingsCursor = nextCursor;
+  if (!bookings.length && !append) {
+    bookingsList.innerHTML = "<div class=\"text-muted\">История записей пуста.</div>";
+    return;
+  }
+  bookings.forEach((booking) => {
+    const item = document.createElement("div");
+    item.className = "list-group-item";
+    
+    const dateObj = new Date(booking.start_time);
+    const dateStr = dateObj.toLocaleDateString();
+    const timeStr = dateObj.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+
+    const parkName =
+      booking.park_name && booking.park_name !== "[]"
+        ? booking.park_name
+        : `Площадка №${booking.playground_id}`;
+
+    item.innerHTML = `
+      <div class="d-flex w-100 justify-content-between">
+          <h6 class="mb-1">${parkName}</h6>
+          <small class="text-muted">${dateStr} ${timeStr}</small>
+      </div>
+      <p class="mb-1 small text-muted">${booking.address || ""}</p>
+      <small class="text-primary">Собака: ${booking.dog_name}</small>
+    `;
+    if (booking.status === "confirmed" && dateObj > new Date()) {
+      const cancelBtn = document.createElement("button");
+      cancelBtn.type = "button";
+      cancelBtn.className = "btn btn-sm btn-outline-danger ms-2";
+      cancelBtn.textContent = "Отменить";
+      cancelBtn.addEventListener("click", () => cancelBooking(booking.id));
+      item.appendChild(cancelBtn);
+    } else if (booking.status === "cancelled") {
+      item.classList.add("text-decoration-line-through");
+    }
+    bookingsList.appendChild(item);
+  });
+  if (bookingsCursor) {
+    const moreBtn = document.createElement("button");
+    moreBtn.type = "button";
+    moreBtn.id = "moreBookingsBtn";
+    moreBtn.className = "list-group-item list-group-item-action text-center text-primary";
+    moreBtn.textContent = "Показать ещё";
+    moreBtn.addEventListener("click", () => loadBookings(bookingsCursor));
+    bookingsList.appendChild(moreBtn);
+  }
+}
+
+async function cancelBooking(bookingId) {
+  try {
+    await axios.post(`/api/bookings/${bookingId}/cancel`);
+    await loadBookings();
+  } catch (error) {
+    alert(error.response?.data?.error || "Не удалось отменить запись.");
+  }
+}
+
+loadProfile();
\ No newline at end of file
@@ -10,10 +10,21 @@ function initMap() {
       center: [55.75, 37.62],
       zoom: 11,
     });
+    // Без выбранного района загружаем только площадки в видимой области
+    map.on("moveend", () => {
+      if (!getDistrictParam()) {
+        loadPlaygrounds();
+      }
+    });
     loadPlaygrounds();
   });
 }
 
+function getDistrictParam() {
+  const urlParams = new URLSearchParams(window.location.search);
+  return urlParams.get("district");
+}
+
 const modalElement = document.getElementById("playgroundModal");
 const modal = new bootstrap.Modal(modalElement);
 
@@ -41,8 +52,41 @@ let currentPlaygroundId = null;
 let dogsCache = [];
 let dogsById = {};
 let selectedSlotHour = null;
+let currentDetails = null;
+let slotEvents = null;
 
 let currentMarkers = [];
+const CLUSTER_ZOOM_THRESHOLD = 14;
+
+// Разбор компактного формата точек (см. app/formats.py)
+function decodePoints(buffer) {
+  const view = new DataView(buffer);
+  const count = view.getUint32(4, true);
+  const flags = view.getUint32(8, true);
+  let offset = 12;
+  const points = new Array(count);
+  let id = 0;
+  for (let i = 0; i < count; i++) {
+    const value = view.getUint32(offset + i * 4, true);
+    id = flags & 2 ? id + value : value;
+    points[i] = { id };
+  }
+  offset += count * 4;
+  for (let i = 0; i < count; i++) {
+    points[i].lat = view.getFloat32(offset + i * 4, true);
+  }
+  offset += count * 4;
+  for (let i = 0; i < count; i++) {
+    points[i].lon = view.getFloat32(offset + i * 4, true);
+  }
+  offset += count * 4;
+  if (flags & 1) {
+    for (let i = 0; i < count; i++) {
+      points[i].distance = view.getUint32(offset + i * 4, true);
+    }
+  }
+  return points;
+}
 
 async function loadPlaygrounds() {
   if (!map) {
@@ -59,10 +103,9 @@ async function loadPlaygrounds() {
   });
   currentMarkers = [];
   
-  const urlParams = new URLSearchParams(window.location.search);
-  const district = urlParams.get("district");
+  const district = getDistrictParam();
   
-  const params = district ? { district } : {};
+  const params = district ? { district } : { bbox: map.getBounds().toBBoxString() };
   
   // Добавляем фильтры
   const lightingCheckbox = document.getElementById("mapFilterLighting");
@@ -81,9 +124,23 @@ async function loadPlaygrounds() {
   
   console.log("Загрузка площадок с параметрами:", params);
   
+  // На мелких масштабах сервер отдаёт готовые кластеры
+  const useClusters = !district && map.getZoom() < CLUSTER_ZOOM_THRESHOLD;
+  if (useClusters) {
+    params.zoom = map.getZoom();
+  } else {
+    params.format = "binary";
+  }
+
   let response;
   try {
-    response = await axios.get("/api/playgrounds", { params });
+    response = await axios.get(
+      useClusters ? "/api/playgrounds/clusters" : "/api/playgrounds",
+      { params, responseType: useClusters ? "json" : "arraybuffer" }
+    );
+    if (!useClusters) {
+      response.data = decodePoints(response.data);
+    }
     console.log("Получено площадок на карте:", response.data?.length || 0);
   } catch (error) {
     console.error("Ошибка загрузки площадок:", error);
@@ -92,6 +149,18 @@ async function loadPlaygrounds() {
   }
   const bounds = [];
   response.data.forEach((playground) => {
+    if (playground.count > 1) {
+      const marker = DG.marker([playground.lat, playground.lon], {
+        icon: DG.divIcon({
+          className: "cluster-marker",
+          html: `<span>${playground.count}</span>`,
+          iconSize: [40, 40],
+        }),
+      }).addTo(map);
+      marker.on("click", () => map.setView([playground.lat, playground.lon], map.getZoom() + 2));
+      currentMarkers.push(marker);
+      return;
+    }
     if (playground.lat && playground.lon) {
       const marker = DG.marker([playground.lat, playground.lon]).addTo(map);
       marker.on("click", () => openPlayground(playground.id));
@@ -99,7 +168,7 @@ async function loadPlaygrounds() {
       bounds.push([playground.lat, playground.lon]);
     }
   });
-  if (bounds.length) {
+  if (district && bounds.length) {
     map.fitBounds(bounds, { padding: [30, 30] });
   }
 }
@@ -215,9 +284,55 @@ async function openPlayground(playgroundId) {
   bookSlotBtn.disabled = true;
   await loadDogs();
   await loadDetails();
+  subscribeSlotEvents();
   modal.show();
 }
 
+// Подписка на изменения слотов вместо повторных запросов деталей
+function subscribeSlotEvents() {
+  unsubscribeSlotEvents();
+  if (!currentPlaygroundId || typeof EventSource === "undefined") {
+    return;
+  }
+  const params = new URLSearchParams();
+  if (dogSelect.value) {
+    params.set("dog_id", dogSelect.value);
+  }
+  slotEvents = new EventSource(
+    `/api/playgrounds/${currentPlaygroundId}/events?${params.toString()}`
+  );
+  slotEvents.addEventListener("slot", (event) => {
+    if (!currentDetails) {
+      return;
+    }
+    const update = JSON.parse(event.data);
+    const slot = currentDetails.slots.find((item) => item.hour === update.hour);
+    if (!slot) {
+      return;
+    }
+    Object.assign(slot, {
+      status: update.status,
+      count: update.count,
+      limit: update.limit,
+      categories: update.categories,
+    });
+    if (slot.status === "full" && selectedSlotHour === slot.hour) {
+      selectedSlotHour = null;
+      bookSlotBtn.disabled = true;
+    }
+    renderModal(currentDetails);
+  });
+}
+
+function unsubscribeSlotEvents() {
+  if (slotEvents) {
+    slotEvents.close();
+    slotEvents = null;
+  }
+}
+
+modalElement.addEventListener("hidden.bs.modal", unsubscribeSlotEvents);
+
 async function loadDetails() {
   if (!currentPlaygroundId) {
     return;
@@ -227,7 +342,8 @@ async function loadDetails() {
     `/api/playgrounds/${currentPlaygroundId}/details`,
     { params: { dog_id: dogId || undefined } }
   );
-  renderModal(response.data);
+  currentDetails = response.data;
+  renderModal(currentDetails);
 }
 
 function formatWorkingHours(workingHours) {
@@ -412,6 +528,7 @@ dogSelect.addEventListener("change", () => {
   selectedSlotHour = null;
   bookSlotBtn.disabled = true;
   loadDetails();
+  subscribeSlotEvents();
 });
 
 function showAuthStatus(message, isSuccess) {